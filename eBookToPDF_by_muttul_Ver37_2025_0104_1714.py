@@ -7,9 +7,20 @@ import io  # 입출력 작업을 위한 핵심 도구를 제공합니다.
 import shutil  # 고수준 파일 연산을 제공합니다.
 import logging  # 로깅 기능을 제공합니다.
 import traceback  # 예외 추적 정보를 제공합니다.
-import tempfile  # 임시 파일 및 디렉토리 생성을 위한 모듈입니다.
 import pygetwindow as gw  # 창 관리를 위한 모듈입니다.
 import subprocess  # 새로운 프로세스를 생성하고 관리합니다.
+import zlib  # PDF 내용 스트림을 압축(FlateDecode)하기 위한 모듈입니다.
+import math  # 크기 계산(올림 등)을 위한 모듈입니다.
+import struct  # PNG 청크를 읽기 위한 모듈입니다.
+import hashlib  # 원본 이미지 내용으로 캐시 키를 만들기 위한 모듈입니다.
+import json  # 페이지 캐시 목록(index.json)을 저장하기 위한 모듈입니다.
+import sqlite3  # 이미지 목록(페이지 매니페스트)을 저장하기 위한 모듈입니다.
+from collections import OrderedDict  # 페이지 캐시를 최근 사용 순서(LRU)로 관리합니다.
+import gc  # 메모리 상한을 넘었을 때 사용하지 않는 객체를 바로 정리합니다.
+from collections import deque  # 처리 중인 페이지 작업을 순서대로 담아 두는 큐입니다.
+import multiprocessing  # 멀티 프로세스 실행(EXE 실행 시 freeze_support)을 위한 모듈입니다.
+from concurrent.futures import ProcessPoolExecutor  # 페이지 처리를 여러 CPU 코어에 나눠 실행합니다.
+from concurrent.futures import ThreadPoolExecutor  # 한 페이지의 여러 압축 방식을 동시에 시험합니다.
 import win32gui
 import win32com.client
 import webbrowser
@@ -19,18 +30,22 @@ from PyQt5.QtWidgets import (QApplication, QMainWindow, QVBoxLayout, QHBoxLayout
                              QPushButton, QSpinBox, QSlider, QWidget, QMessageBox,
                              QFileDialog, QScrollArea, QTabWidget, QGroupBox, QListWidget,
                              QSizePolicy, QProgressBar, QCheckBox, QButtonGroup, QRadioButton, 
-                             QSpacerItem)  
+                             QSpacerItem, QListWidgetItem, QDoubleSpinBox, QComboBox)  
 from PyQt5.QtGui import QPixmap, QPainter, QPen, QColor, QFont, QIcon
-from PyQt5.QtCore import Qt, QRect, QPoint, QSize, QUrl, QThread, pyqtSignal
+from PyQt5.QtCore import Qt, QRect, QPoint, QSize, QUrl, QThread, QTimer, pyqtSignal
 
-# ReportLab 라이브러리에서 필요한 클래스들을 임포트합니다.
-from reportlab.pdfgen import canvas
+# ReportLab 라이브러리에서 용지 크기를 임포트합니다.
 from reportlab.lib.pagesizes import letter
 from reportlab.lib.pagesizes import A4, landscape
+import numpy as np  # 이미지 배열을 한꺼번에 계산(벡터 연산)하기 위한 모듈입니다.
 from PIL import Image  # 이미지 처리를 위한 Pillow 라이브러리를 임포트합니다.
-from PyPDF2 import PdfReader, PdfWriter  # PDF 파일 처리를 위한 PyPDF2 라이브러리를 임포트합니다.
-from reportlab.lib.utils import ImageReader
+from PIL import JpegImagePlugin  # JPEG 크로마 서브샘플링(MCU 크기) 확인용입니다.
+from PIL import features  # Pillow에 libtiff(CCITT G4 압축)가 포함되어 있는지 확인합니다.
 from datetime import datetime  # 시스템 날짜, 시간 가져오기 위한 임포트합니다.
+try:
+    import psutil  # 메모리 사용량(RSS) 확인용입니다. (설치되어 있지 않으면 메모리 상한 기능을 끕니다.)
+except ImportError:
+    psutil = None
 
 # 로깅 설정을 초기화합니다.
 logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -40,6 +55,1334 @@ def show_message(self, title, message):
     # 메인 윈도우를 부모로 지정하여 메시지 박스 표시
     QMessageBox.information(self, title, message)
 
+# 이미지 파일 확장자 목록입니다.
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.gif', '.bmp')
+
+# 폴더의 이미지 파일 이름을 이름 순서대로 하나씩 돌려줍니다. (os.scandir는 파일을 열지 않고 목록만 읽습니다.)
+def scan_image_files(folder):
+    with os.scandir(folder) as entries:
+        names = sorted(entry.name for entry in entries if entry.is_file() and entry.name.lower().endswith(IMAGE_EXTENSIONS))
+    yield from names
+
+# 매니페스트에 기록할 이미지 정보를 읽는 작업 함수 (파일을 한 번만 읽어 해시와 헤더 정보를 함께 구합니다.)
+def read_manifest_entry(img_path):
+    stat = os.stat(img_path)
+    with open(img_path, 'rb') as f:
+        source_bytes = f.read()
+    width = height = mode = image_format = None
+    try:
+        with Image.open(io.BytesIO(source_bytes)) as img:  # 헤더만 읽습니다.
+            width, height = img.size
+            mode, image_format = img.mode, img.format
+    except Exception as e:
+        logging.error(f"이미지 정보를 읽는 중 오류 발생 {img_path}: {str(e)}")  # 읽지 못한 파일도 기록해 두고 PDF 생성 때 오류로 표시합니다.
+    return (os.path.basename(img_path), width, height, mode, image_format,
+            stat.st_size, stat.st_mtime_ns, hashlib.sha1(source_bytes).hexdigest())
+
+# Image 폴더 옆에 두는 이미지 목록(매니페스트)
+# 페이지 순서, 크기, 모드, 형식, 파일 크기, 수정 시각, 내용 해시를 기록해 두고, 바뀐 파일만 다시 읽습니다.
+class PageManifest:
+    parallel_threshold = 32  # 바뀐 파일이 이보다 많으면 프로세스 풀로 나눠 읽습니다.
+
+    def __init__(self, image_folder):
+        self.image_folder = image_folder
+        self.path = os.path.join(os.path.dirname(image_folder), "image_manifest.sqlite3")
+        self.connection = sqlite3.connect(self.path)
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS pages (
+                name TEXT PRIMARY KEY,
+                page_order INTEGER,
+                width INTEGER,
+                height INTEGER,
+                mode TEXT,
+                format TEXT,
+                size INTEGER,
+                mtime_ns INTEGER,
+                sha1 TEXT
+            )""")
+        self.connection.commit()
+
+    def refresh(self, workers=1):
+        # os.scandir로 파일 크기와 수정 시각만 비교해서 새로 생기거나 바뀐 파일만 다시 읽습니다.
+        known = {name: (size, mtime_ns) for name, size, mtime_ns in
+                 self.connection.execute("SELECT name, size, mtime_ns FROM pages")}
+        names = []
+        changed = []
+        with os.scandir(self.image_folder) as entries:
+            for entry in entries:
+                if entry.is_file() and entry.name.lower().endswith(IMAGE_EXTENSIONS):
+                    names.append(entry.name)
+                    stat = entry.stat()
+                    if known.get(entry.name) != (stat.st_size, stat.st_mtime_ns):
+                        changed.append(entry.path)
+        removed = set(known) - set(names)
+        if not changed and not removed:
+            return 0
+
+        workers = max(1, min(workers, len(changed)))
+        if workers > 1 and len(changed) >= self.parallel_threshold:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                rows = list(executor.map(read_manifest_entry, changed, chunksize=max(1, len(changed) // (workers * 4))))
+        else:
+            rows = [read_manifest_entry(img_path) for img_path in changed]
+
+        self.connection.executemany("DELETE FROM pages WHERE name = ?", [(name,) for name in removed])
+        self.connection.executemany("""
+            INSERT OR REPLACE INTO pages (name, width, height, mode, format, size, mtime_ns, sha1)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)""", rows)
+        # 페이지 순서는 파일 이름 순서입니다.
+        self.connection.executemany("UPDATE pages SET page_order = ? WHERE name = ?",
+                                    [(order, name) for order, name in enumerate(sorted(names))])
+        self.connection.commit()
+        logging.info(f"이미지 목록 갱신: 새로 읽음 {len(rows)}개, 삭제 {len(removed)}개")
+        return len(rows) + len(removed)
+
+    def pages(self):
+        # 페이지 순서대로 (이름, 가로, 세로, 모드, 형식, 파일 크기, 해시) 목록을 돌려줍니다.
+        return self.connection.execute(
+            "SELECT name, width, height, mode, format, size, sha1 FROM pages ORDER BY page_order").fetchall()
+
+    def names(self):
+        return [row[0] for row in self.connection.execute("SELECT name FROM pages ORDER BY page_order")]
+
+    def close(self):
+        self.connection.close()
+
+# 현재 프로세스와 작업 프로세스들의 메모리 사용량(RSS) 합계를 MB 단위로 돌려줍니다. (psutil이 없으면 0)
+def process_tree_rss_mb():
+    if psutil is None:
+        return 0
+    process = psutil.Process()
+    rss = process.memory_info().rss
+    for child in process.children(recursive=True):
+        try:
+            rss += child.memory_info().rss
+        except psutil.Error:
+            pass  # 이미 종료된 작업 프로세스는 건너뜁니다.
+    return rss / (1024 * 1024)
+
+# 분석용으로 이미지를 (크롭한 뒤) 지정한 크기의 흑백 배열로 작게 읽습니다. (JPEG는 draft로 디코딩부터 작게 합니다.)
+def load_gray_thumbnail(img_path, crop_box, size):
+    with Image.open(img_path) as img:
+        original_width, original_height = img.size
+        left, top, right, bottom = crop_box or (0, 0, original_width, original_height)
+        # 크롭한 영역이 size 이상으로 남도록 전체 이미지 기준의 요청 크기를 계산합니다.
+        img.draft('L', (size[0] * original_width // max(1, right - left) + 1,
+                        size[1] * original_height // max(1, bottom - top) + 1))
+        scale_x = img.width / original_width
+        scale_y = img.height / original_height
+        region = img.crop((int(left * scale_x), int(top * scale_y), int(right * scale_x), int(bottom * scale_y)))
+        return np.asarray(region.convert('L').resize(size, Image.BILINEAR), dtype=np.uint8)
+
+# 중복 페이지 검사용 썸네일을 읽는 작업 함수 (프로세스 풀에서 실행됩니다.)
+def load_hash_thumbnail(task):
+    img_path, crop_box = task
+    try:
+        return load_gray_thumbnail(img_path, crop_box, (32, 32))
+    except Exception as e:
+        logging.error(f"중복 검사용 이미지 로드 중 오류 발생 {img_path}: {str(e)}")
+        return None
+
+# n x n DCT-II 변환 행렬을 만듭니다.
+def dct_matrix(n):
+    k = np.arange(n)[:, None]
+    x = np.arange(n)[None, :]
+    matrix = np.cos(np.pi * (2 * x + 1) * k / (2 * n)) * np.sqrt(2 / n)
+    matrix[0] /= np.sqrt(2)
+    return matrix
+
+# 32x32 썸네일 묶음(N, 32, 32)의 지각 해시(pHash, 64비트)를 한꺼번에 계산합니다.
+def perceptual_hashes(thumbnails):
+    dct = dct_matrix(32)
+    coefficients = dct @ thumbnails.astype(np.float32) @ dct.T  # 모든 페이지의 2차원 DCT를 한 번에 계산합니다.
+    low = coefficients[:, :8, :8].reshape(len(thumbnails), 64)  # 저주파 8x8 성분만 사용합니다.
+    median = np.median(low[:, 1:], axis=1, keepdims=True)  # DC 성분은 빼고 중앙값을 구합니다.
+    return low > median  # (N, 64) 불리언 배열
+
+# 바로 앞 페이지와 해시가 max_distance 비트 이하로 다른 페이지(넘김 실패로 같은 화면이 찍힌 페이지)를 찾습니다.
+def find_duplicate_pages(hashes, max_distance):
+    if len(hashes) < 2:
+        return []
+    distances = np.count_nonzero(hashes[1:] != hashes[:-1], axis=1)  # 연속한 두 페이지의 해밍 거리
+    return [(int(index) + 1, int(distances[index])) for index in np.nonzero(distances <= max_distance)[0]]
+
+# 자동 크롭용 썸네일(전체 화면을 축소한 회색조)을 읽는 작업 함수 (프로세스 풀에서 실행됩니다.)
+def load_crop_thumbnail(task):
+    img_path, size = task
+    try:
+        return load_gray_thumbnail(img_path, None, size)
+    except Exception as e:
+        logging.error(f"자동 크롭용 이미지 로드 중 오류 발생 {img_path}: {str(e)}")
+        return None
+
+# 내용 픽셀 수 프로필에서 내용이 있는 구간들을 찾아(gap 이하의 빈틈은 이어 붙입니다.) 내용이 가장 많은 구간을 고릅니다.
+# (본문과 떨어져 있는 뷰어의 시계, 쪽 번호 표시줄 같은 작은 구간을 빼기 위한 것입니다.)
+def main_content_band(profile, gap):
+    positions = np.flatnonzero(profile)
+    if positions.size == 0:
+        return None
+    breaks = np.flatnonzero(np.diff(positions) > gap + 1)
+    starts = np.r_[positions[0], positions[breaks + 1]]
+    ends = np.r_[positions[breaks], positions[-1]]
+    totals = np.r_[0, np.cumsum(profile)]
+    best = np.argmax(totals[ends + 1] - totals[starts])
+    return int(starts[best]), int(ends[best])
+
+# 축소한 페이지 묶음(N x 높이 x 너비)에서 책 내용이 들어 있는 영역을 찾습니다.
+# 모든 페이지의 중앙값은 변하지 않는 뷰어 화면과 종이 배경이 되므로, 중앙값과 다른 픽셀을 페이지 내용으로 봅니다.
+# 페이지별 내용 상자에서 outlier_percent 만큼의 바깥쪽 페이지를 빼고 (0이면 모든 페이지의 합집합) 영역을 정합니다.
+# 돌려주는 값: 썸네일 좌표 (left, top, right, bottom), right/bottom은 포함하지 않습니다. (내용이 없으면 None)
+def find_content_box(stack, outlier_percent=0, threshold=24, gap_ratio=0.03, median_pages=256, chunk_pages=64):
+    count, height, width = stack.shape
+    sample = stack[stratified_sample(count, median_pages)]
+    background = np.median(sample, axis=0).astype(np.int16)
+
+    # 배경과의 차이는 chunk_pages 개씩 나눠 계산합니다. (묶음 전체를 int16으로 바꾸면 묶음 크기의 몇 배 메모리를 씁니다.)
+    def content_chunks():
+        for start in range(0, count, chunk_pages):
+            yield np.abs(stack[start:start + chunk_pages].astype(np.int16) - background) > threshold
+
+    # 위치마다 내용이 있는 페이지 수
+    hits = np.zeros((height, width), dtype=np.int64)
+    for content in content_chunks():
+        hits += content.sum(axis=0)
+
+    rows = main_content_band(hits.sum(axis=1), int(height * gap_ratio))
+    if rows is None:
+        return None
+    columns = main_content_band(hits[rows[0]:rows[1] + 1].sum(axis=0), int(width * gap_ratio))
+
+    # 페이지마다 내용이 있는 첫 행/열과 마지막 행/열
+    tops, bottoms, lefts, rights = [], [], [], []
+    for content in content_chunks():
+        content = content[:, rows[0]:rows[1] + 1, columns[0]:columns[1] + 1]
+        row_hits = content.any(axis=2)
+        column_hits = content.any(axis=1)
+        has_content = row_hits.any(axis=1)
+        row_hits = row_hits[has_content]
+        column_hits = column_hits[has_content]
+        tops.append(row_hits.argmax(axis=1))
+        bottoms.append(row_hits.shape[1] - row_hits[:, ::-1].argmax(axis=1))
+        lefts.append(column_hits.argmax(axis=1))
+        rights.append(column_hits.shape[1] - column_hits[:, ::-1].argmax(axis=1))
+    tops, bottoms, lefts, rights = (np.concatenate(values) for values in (tops, bottoms, lefts, rights))
+
+    return (columns[0] + int(np.percentile(lefts, outlier_percent, method='lower')),
+            rows[0] + int(np.percentile(tops, outlier_percent, method='lower')),
+            columns[0] + int(np.percentile(rights, 100 - outlier_percent, method='higher')),
+            rows[0] + int(np.percentile(bottoms, 100 - outlier_percent, method='higher')))
+
+# 페이지 하나의 내용 영역을 크롭 영역 안에서 찾는 작업 함수 (프로세스 풀에서 실행됩니다.)
+# 축소본의 행/열 투영(배경과 다른 픽셀 수)으로 찾으며, 돌려주는 값은 원본 좌표 (left, top, right, bottom)입니다.
+# (빈 페이지이거나 읽지 못하면 None)
+def detect_page_content_box(task):
+    img_path, crop_box, thumbnail_side, threshold = task
+    try:
+        left, top, right, bottom = crop_box
+        scale = thumbnail_side / max(right - left, bottom - top)
+        size = (max(1, round((right - left) * scale)), max(1, round((bottom - top) * scale)))
+        thumbnail = load_gray_thumbnail(img_path, crop_box, size).astype(np.int16)
+        content = np.abs(thumbnail - int(np.median(thumbnail))) > threshold  # 가장 많은 밝기를 배경으로 봅니다.
+        rows = np.flatnonzero(content.any(axis=1))
+        columns = np.flatnonzero(content.any(axis=0))
+        if rows.size == 0:
+            return None
+        scale_x = (right - left) / size[0]
+        scale_y = (bottom - top) / size[1]
+        return (left + int(columns[0] * scale_x), top + int(rows[0] * scale_y),
+                left + math.ceil((columns[-1] + 1) * scale_x), top + math.ceil((rows[-1] + 1) * scale_y))
+    except Exception as e:
+        logging.error(f"페이지 내용 영역을 찾는 중 오류 발생 {img_path}: {str(e)}")
+        return None
+
+# 페이지별 내용 영역을 모든 페이지에 같은 크기의 상자(가장 큰 내용 영역 + 여백)로 맞춥니다.
+# 상자는 각 페이지 내용의 가운데에 두되 크롭 영역 밖으로 나가지 않게 하고, 빈 페이지는 크롭 영역 가운데에 둡니다.
+def fit_crop_envelope(content_boxes, crop_box, padding):
+    crop_left, crop_top, crop_right, crop_bottom = crop_box
+    found = [box for box in content_boxes if box]
+    if not found:
+        return [crop_box] * len(content_boxes)
+    width = min(crop_right - crop_left, max(right - left for left, top, right, bottom in found) + 2 * padding)
+    height = min(crop_bottom - crop_top, max(bottom - top for left, top, right, bottom in found) + 2 * padding)
+
+    crop_table = []
+    for box in content_boxes:
+        left, top, right, bottom = box or crop_box
+        x = min(max((left + right - width) // 2, crop_left), crop_right - width)
+        y = min(max((top + bottom - height) // 2, crop_top), crop_bottom - height)
+        crop_table.append((x, y, x + width, y + height))
+    return crop_table
+
+# 이미지를 용지 가운데에 비율을 유지하며 최대한 크게 배치할 위치와 크기를 계산합니다.
+def fit_image_to_page(img_width, img_height, page_width, page_height):
+    width_ratio = page_width / img_width
+    height_ratio = page_height / img_height
+    scale_factor = min(width_ratio, height_ratio)
+
+    new_width = img_width * scale_factor
+    new_height = img_height * scale_factor
+
+    x_centered = (page_width - new_width) / 2
+    y_centered = (page_height - new_height) / 2
+    return x_centered, y_centered, new_width, new_height
+
+# PDF에 쓸 숫자를 짧은 문자열로 바꿉니다. (예: 595.2756 -> "595.2756", 10.0 -> "10")
+def pdf_number(value):
+    text = f"{value:.4f}".rstrip('0').rstrip('.')
+    return text if text not in ('', '-0') else '0'
+
+# 색 공간 이름('DeviceRGB')이나 배열('[/Indexed ...]')을 PDF에 쓸 형식으로 바꿉니다.
+def pdf_colorspace(colorspace):
+    return colorspace if colorspace.startswith('[') else f"/{colorspace}"
+
+# 이미지 페이지를 한 번에 PDF 파일로 써 내려가는 클래스
+# (객체를 만들자마자 파일에 쓰고 위치만 기억하므로 페이지 수가 많아도 메모리가 늘지 않습니다.)
+class StreamingPdfWriter:
+    def __init__(self, pdf_path, pagesize=A4, version="1.4"):
+        self.pdf_path = pdf_path
+        self.page_width, self.page_height = pagesize
+        self.file = open(pdf_path, 'wb')
+        self.position = 0  # 지금까지 쓴 바이트 수 (xref에 쓸 객체 위치)
+        self.offsets = [None, None, None]  # 객체 번호별 파일 위치 (0번은 사용하지 않음, 1: Catalog, 2: Pages)
+        self.page_ids = []  # 페이지 객체 번호 목록 (Pages의 Kids)
+        self.image_ids = {}  # 이미지 스트림 내용 해시: 객체 번호 (같은 이미지는 한 번만 쓰고 다시 참조합니다.)
+        self.reused_images = 0  # 이미 쓴 이미지를 다시 참조한 횟수
+        self.write(f"%PDF-{version}\n".encode('latin-1') + b"%\xe2\xe3\xcf\xd3\n")
+
+    def write(self, data):
+        self.file.write(data)
+        self.position += len(data)
+
+    def new_object_id(self):
+        self.offsets.append(None)
+        return len(self.offsets) - 1
+
+    def write_object(self, obj_id, dictionary, stream=None):
+        self.offsets[obj_id] = self.position
+        if stream is None:
+            self.write(f"{obj_id} 0 obj\n{dictionary}\nendobj\n".encode('latin-1'))
+        else:
+            self.write(f"{obj_id} 0 obj\n{dictionary}\nstream\n".encode('latin-1'))
+            self.write(stream)
+            self.write(b"\nendstream\nendobj\n")
+
+    def add_image_page(self, image):
+        # image: {'data', 'width', 'height', 'filter', 'colorspace', 'bpc', 'decode_parms'(선택)} (작업 함수가 만든 이미지 스트림)
+        # 여러 층으로 된 페이지(MRC)는 'layers'에 층별 정보가, 'data'에 층별 스트림이 이어 붙어 있습니다. (층마다 'length')
+        if image.get('layers'):
+            layers = []
+            position = 0
+            for layer in image['layers']:
+                layers.append(dict(layer, data=image['data'][position:position + layer['length']]))
+                position += layer['length']
+        else:
+            layers = [image]
+        layer_ids = [None] * len(layers)
+        for n in sorted(range(len(layers)), key=lambda n: 'mask' in layers[n]):  # /Mask로 참조할 층의 번호를 먼저 정합니다.
+            layer_ids[n] = self.image_object(layers[n], layer_ids)
+
+        # 기존 create_pdf와 같은 방식으로 가운데 정렬, 비율 유지 배치
+        # (층은 모두 같은 자리에 겹쳐 그리고, 'bbox'(페이지 픽셀 좌표, 위쪽이 0)가 있는 층은 그 부분에만 그립니다.)
+        x, y, width, height = fit_image_to_page(image['width'], image['height'], self.page_width, self.page_height)
+        drawn = [n for n, layer in enumerate(layers) if not layer.get('image_mask')]  # 마스크 층은 직접 그리지 않습니다.
+        commands = []
+        for n in drawn:
+            left, top, right, bottom = layers[n].get('bbox') or (0, 0, image['width'], image['height'])
+            scale_x = width / image['width']
+            scale_y = height / image['height']
+            commands.append(f"q {pdf_number((right - left) * scale_x)} 0 0 {pdf_number((bottom - top) * scale_y)}"
+                            f" {pdf_number(x + left * scale_x)} {pdf_number(y + (image['height'] - bottom) * scale_y)} cm /Im{n} Do Q")
+        content = zlib.compress(" ".join(commands).encode('latin-1'))
+        content_id = self.new_object_id()
+        self.write_object(content_id, f"<< /Filter /FlateDecode /Length {len(content)} >>", content)
+
+        xobjects = " ".join(f"/Im{n} {layer_ids[n]} 0 R" for n in drawn)
+        page_id = self.new_object_id()
+        self.write_object(page_id,
+                          f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {pdf_number(self.page_width)} {pdf_number(self.page_height)}]"
+                          f" /Resources << /XObject << {xobjects} >> >> /Contents {content_id} 0 R >>")
+        self.page_ids.append(page_id)
+
+    # 이미지 XObject를 쓰고 객체 번호를 돌려줍니다.
+    # (빈 페이지, 반복되는 장 제목, 넘김 실패로 같은 화면 등 사전과 스트림이 모두 같은 이미지는 앞에서 쓴 객체를 다시 참조합니다.)
+    def image_object(self, layer, layer_ids):
+        dictionary = self.image_dictionary(layer, layer_ids)
+        key = hashlib.sha1(dictionary.encode('latin-1') + layer['data']).digest()
+        if key in self.image_ids:
+            self.reused_images += 1
+            return self.image_ids[key]
+        image_id = self.new_object_id()
+        self.write_object(image_id, dictionary, layer['data'])
+        self.image_ids[key] = image_id
+        return image_id
+
+    # 이미지 XObject의 사전을 만듭니다. (layer_ids: 같은 페이지 층들의 객체 번호, /Mask 참조에 씁니다.)
+    def image_dictionary(self, layer, layer_ids):
+        if layer.get('image_mask'):
+            pixel_format = " /ImageMask true /BitsPerComponent 1"  # 1비트 스텐실 마스크 (0인 곳을 칠합니다.)
+        else:
+            pixel_format = f" /ColorSpace {pdf_colorspace(layer['colorspace'])} /BitsPerComponent {layer['bpc']}"
+        decode_parms = f" /DecodeParms {layer['decode_parms']}" if layer.get('decode_parms') else ""
+        mask = f" /Mask {layer_ids[layer['mask']]} 0 R" if 'mask' in layer else ""  # 마스크 층이 0인 곳만 칠합니다.
+        interpolate = " /Interpolate true" if layer.get('interpolate') else ""
+        return (f"<< /Type /XObject /Subtype /Image /Width {layer['width']} /Height {layer['height']}{pixel_format}"
+                f" /Filter /{layer['filter']}{decode_parms}{mask}{interpolate} /Length {len(layer['data'])} >>")
+
+    def close(self):
+        # 페이지 트리, 카탈로그, xref 테이블, 트레일러를 쓰고 파일을 닫습니다.
+        kids = " ".join(f"{page_id} 0 R" for page_id in self.page_ids)
+        self.write_object(2, f"<< /Type /Pages /Kids [{kids}] /Count {len(self.page_ids)} >>")
+        self.write_object(1, "<< /Type /Catalog /Pages 2 0 R >>")
+
+        xref_position = self.position
+        self.write(f"xref\n0 {len(self.offsets)}\n0000000000 65535 f \n".encode('latin-1'))
+        for offset in self.offsets[1:]:
+            self.write(f"{offset:010d} 00000 n \n".encode('latin-1'))
+        self.write(f"trailer\n<< /Size {len(self.offsets)} /Root 1 0 R >>\nstartxref\n{xref_position}\n%%EOF\n".encode('latin-1'))
+        self.file.close()
+
+    def abort(self):
+        # 만들다 만 PDF 파일을 닫고 지웁니다.
+        self.file.close()
+        if os.path.exists(self.pdf_path):
+            os.remove(self.pdf_path)
+
+# 페이지 인코딩 방식이 바뀌면 이 값을 올려서 이전 캐시를 쓰지 않도록 합니다.
+ENCODER_VERSION = 1
+
+# 캐시 키에 들어가는 설정 이름 (이 값들이 같으면 같은 원본에서 같은 결과가 나옵니다.)
+CACHE_KEY_OPTIONS = ('crop_box', 'compression_level', 'pagesize', 'jpegtran_path', 'target_dpi', 'bilevel_text',
+                     'grayscale_detect', 'auto_encoder', 'min_psnr', 'min_ssim', 'class_quality', 'split_spreads', 'deskew', 'flatten_background', 'mrc', 'jpx_rate', 'jpeg_qtables',
+                     'jpeg_subsampling')
+
+# 원본 이미지 내용 해시와 설정으로 페이지 캐시 키를 만듭니다.
+def page_cache_key(source_hash, options):
+    settings = [ENCODER_VERSION] + [options.get(name) for name in CACHE_KEY_OPTIONS]
+    return hashlib.sha1(f"{source_hash}|{json.dumps(settings)}".encode('utf-8')).hexdigest()
+
+# 인코딩이 끝난 페이지를 디스크에 보관해 두었다가 다시 PDF를 만들 때 재사용하는 캐시
+# (크기 상한을 넘으면 가장 오래 사용하지 않은 페이지부터 지웁니다.)
+class PageCache:
+    def __init__(self, cache_dir, max_mb):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_mb * 1024 * 1024
+        self.index_path = os.path.join(cache_dir, "index.json")
+        self.entries = OrderedDict()  # 캐시 키: 파일 크기 (앞쪽일수록 오래 사용하지 않은 페이지)
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(cache_dir, exist_ok=True)
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                for key, size in json.load(f):
+                    self.entries[key] = size
+                    self.total_bytes += size
+        except (OSError, ValueError):
+            pass  # 목록이 없거나 깨졌으면 빈 캐시로 시작합니다.
+
+    @staticmethod
+    def entry_path(cache_dir, key):
+        return os.path.join(cache_dir, key[:2], f"{key}.page")
+
+    @staticmethod
+    def read_entry(cache_dir, key):
+        # 작업 프로세스에서도 호출하므로 목록은 건드리지 않고 파일만 읽습니다.
+        try:
+            with open(PageCache.entry_path(cache_dir, key), 'rb') as f:
+                header = f.readline()
+                page_image = json.loads(header)
+                page_image['data'] = f.read()
+            return page_image
+        except (OSError, ValueError):
+            return None
+
+    def record_hit(self, key):
+        self.hits += 1
+        if key in self.entries:
+            self.entries.move_to_end(key)  # 최근 사용한 페이지로 옮깁니다.
+        else:
+            # 작업 프로세스가 읽은 뒤에 store()가 공간을 비우느라 지웠을 수 있습니다. (페이지는 이미 읽었으므로 목록에만 넣지 않습니다.)
+            try:
+                size = os.path.getsize(self.entry_path(self.cache_dir, key))
+            except OSError:
+                return
+            self.entries[key] = size
+            self.total_bytes += size
+
+    def store(self, key, page_image):
+        self.misses += 1
+        path = self.entry_path(self.cache_dir, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        header = {name: value for name, value in page_image.items() if name not in ('data', 'cache_key', 'cache_hit')}
+        with open(path, 'wb') as f:
+            f.write(json.dumps(header).encode('utf-8') + b"\n")
+            f.write(page_image['data'])
+        size = os.path.getsize(path)
+        self.total_bytes += size - self.entries.pop(key, 0)
+        self.entries[key] = size
+        self.evict()
+
+    def evict(self):
+        while self.total_bytes > self.max_bytes and self.entries:
+            key, size = self.entries.popitem(last=False)  # 가장 오래 사용하지 않은 페이지
+            self.total_bytes -= size
+            try:
+                os.remove(self.entry_path(self.cache_dir, key))
+            except OSError:
+                pass
+
+    def save_index(self):
+        with open(self.index_path, 'w', encoding='utf-8') as f:
+            json.dump(list(self.entries.items()), f)
+
+# 다시 인코딩해야 적용되는 설정 (하나라도 켜져 있으면 jpegtran 무손실 자르기를 쓰지 않습니다.)
+REENCODE_OPTIONS = ('min_ssim', 'class_quality', 'deskew', 'flatten_background', 'bilevel_text', 'grayscale_detect',
+                    'auto_encoder', 'mrc', 'jpx_rate', 'jpeg_qtables')
+
+# 잘라낸 JPEG 원본을 그대로 넣어도 설정이 모두 지켜지는지 확인합니다.
+def lossless_crop_allowed(options):
+    return not any(options[name] for name in REENCODE_OPTIONS) and options['jpeg_subsampling'] < 0
+
+# PDF 생성 시 캡처 한 장을 처리하는 작업 함수 (프로세스 풀에서 실행되므로 모듈 최상위에 둡니다.)
+# 돌려주는 값: (순서, 파일명, PDF 페이지 목록, 오류) - 펼침 화면을 나누면 캡처 한 장에서 두 페이지가 나옵니다.
+def process_page_image(task):
+    index, img_path, source_hash, options = task
+    img_file = os.path.basename(img_path)
+    try:
+        page_count = 2 if options['split_spreads'] else 1
+
+        # 원본 내용과 설정이 같은 페이지는 캐시에 저장된 결과를 그대로 씁니다.
+        # (해시는 매니페스트에 기록된 값을 쓰므로 캐시에 있으면 원본 파일을 읽지 않습니다.)
+        source_bytes = None
+        cache_keys = [None] * page_count
+        page_images = None
+        if options['cache_dir']:
+            if source_hash is None:
+                with open(img_path, 'rb') as f:
+                    source_bytes = f.read()
+                source_hash = hashlib.sha1(source_bytes).hexdigest()
+            cache_key = page_cache_key(source_hash, options)
+            cache_keys = [cache_key] if page_count == 1 else [f"{cache_key}_{n}" for n in range(page_count)]
+            page_images = [PageCache.read_entry(options['cache_dir'], key) for key in cache_keys]
+            if None in page_images:
+                page_images = None
+        cache_hit = page_images is not None
+
+        if source_bytes is None and (page_images is None or options['save_dir']):
+            with open(img_path, 'rb') as f:
+                source_bytes = f.read()
+
+        target_size = page_target_size(options)
+
+        # JPEG 원본은 jpegtran으로 DCT 영역에서 바로 잘라 다시 압축하지 않고 넣습니다. (크기를 줄일 때는 사용할 수 없습니다.)
+        # (픽셀을 바꾸거나 압축 방식, 품질을 다시 정하는 설정이 켜져 있으면 사용하지 않습니다.)
+        if page_images is None and page_count == 1 and target_size is None and lossless_crop_allowed(options) \
+                and options['jpegtran_path'] and source_bytes[:2] == b'\xff\xd8':
+            page_image = crop_jpeg_lossless(source_bytes, options['crop_box'], options['jpegtran_path'])
+            if page_image:
+                page_images = [page_image]
+
+        if page_images is None or options['save_dir']:
+            pages = load_page_images(source_bytes, options)
+            del source_bytes
+
+            # 크롭된 이미지 저장 (선택한 경우에만)
+            if options['save_dir']:
+                for n, page in enumerate(pages):
+                    suffix = f"_{n + 1}" if page_count > 1 else ""
+                    page.save(os.path.join(options['save_dir'], f"cropped_image_{index+1}{suffix}.png"))
+
+            if page_images is None:
+                page_images = [encode_page_image(page, options) for page in pages]
+            for page in pages:
+                page.close()  # 디코딩한 픽셀 메모리를 바로 해제합니다.
+
+        for page_image, cache_key in zip(page_images, cache_keys):
+            page_image['cache_key'] = cache_key
+            page_image['cache_hit'] = cache_hit
+        return index, img_file, page_images, None
+    except Exception as e:
+        return index, img_file, None, str(e)  # 오류는 메인 프로세스에서 표시합니다.
+
+# 종이 질감, 그라데이션, 잡티처럼 배경과 거의 같은 픽셀을 순백(어두운 테마는 검정)으로 바꿉니다.
+# 배경색은 가장 흔한 밝기 주변 픽셀의 중앙값으로 정하며, 모든 채널이 배경색과 tolerance 이내인 픽셀만 바꾸므로 글자는 그대로입니다.
+# (배경이 페이지의 min_share보다 적은 사진 같은 페이지는 건드리지 않습니다.)
+def flatten_background(img, tolerance=24, min_share=0.3):
+    if img.mode not in ('RGB', 'L'):
+        img = img.convert('RGB')
+    pixels = np.asarray(img)
+    channels = 1 if pixels.ndim == 2 else pixels.shape[2]
+    sample = pixels.reshape(-1, channels)[::31]
+    luma = sample.mean(axis=1)
+    histogram = np.bincount(luma.astype(np.uint8), minlength=256)
+    # 질감이나 그라데이션이 있는 종이는 밝기가 여러 칸에 퍼지므로, ±tolerance 범위로 합친 히스토그램에서 가장 많은 밝기를 찾습니다.
+    # (한 칸씩 세면 한 가지 밝기로 칠해진 글자가 배경보다 많아집니다.)
+    smoothed = np.convolve(histogram, np.ones(2 * tolerance + 1), mode='same')
+    peak = int(smoothed.argmax())
+    near_peak = np.abs(luma - peak) <= tolerance
+    if near_peak.mean() < min_share:
+        return img
+
+    background = np.median(sample[near_peak], axis=0).astype(np.int16)
+    distance = np.abs(pixels.astype(np.int16) - (background if channels > 1 else background[0]))
+    if channels > 1:
+        distance = distance.max(axis=2)
+    flattened = pixels.copy()
+    flattened[distance <= tolerance] = 255 if peak >= 128 else 0
+    result = Image.fromarray(flattened, img.mode)
+    img.close()
+    return result
+
+# 기울기 보정에서 찾을 최대 각도와, 이보다 작은 기울기는 돌리지 않는 최소 각도(도)
+DESKEW_MAX_ANGLE = 3.0
+DESKEW_MIN_ANGLE = 0.1
+
+# 페이지의 기울기(도, 반시계 방향이 +)를 찾습니다.
+# 글자 픽셀을 여러 각도로 기울여 행마다 세었을 때, 줄과 줄 사이가 가장 또렷하게 갈라지는(행 합계의 제곱합이 가장 큰) 각도를 고릅니다.
+def estimate_skew_angle(img, max_side=1024, threshold=64, max_points=200000):
+    gray = analysis_array(img, max_side).mean(axis=2)
+    ys, xs = np.nonzero(np.abs(gray - np.median(gray)) > threshold)
+    if ys.size < 100:
+        return 0.0  # 글자가 거의 없는 페이지
+    if ys.size > max_points:
+        step = ys.size // max_points + 1
+        ys, xs = ys[::step], xs[::step]
+    xs = xs - gray.shape[1] / 2
+    offset = int(np.abs(xs).max() * math.tan(math.radians(DESKEW_MAX_ANGLE))) + 2
+
+    def score(angle):
+        rows = np.round(ys + xs * math.tan(math.radians(angle))).astype(np.int64) + offset
+        counts = np.bincount(rows)
+        return float(np.dot(counts, counts))
+
+    # 0.25도 간격으로 찾은 뒤 그 주변을 0.05도 간격으로 다시 찾습니다.
+    angles = np.arange(-DESKEW_MAX_ANGLE, DESKEW_MAX_ANGLE + 1e-9, 0.25)
+    best = max(angles, key=score)
+    angles = np.arange(best - 0.25, best + 0.25 + 1e-9, 0.05)
+    return float(max(angles, key=score))
+
+# 기울어진 페이지를 바로 세웁니다. (기울기가 DESKEW_MIN_ANGLE보다 작으면 그대로 둡니다.)
+def deskew_page(img):
+    angle = estimate_skew_angle(img)
+    if abs(angle) < DESKEW_MIN_ANGLE:
+        return img
+    if img.mode not in ('RGB', 'L'):
+        img = img.convert('RGB')
+    # 돌리면서 생기는 빈 모서리는 배경색(가장 많은 밝기)으로 채웁니다.
+    pixels = np.asarray(img).reshape(-1, 1 if img.mode == 'L' else 3)
+    background = tuple(int(value) for value in np.median(pixels[::97], axis=0))
+    rotated = img.rotate(-angle, resample=Image.BICUBIC, fillcolor=background[0] if img.mode == 'L' else background)
+    img.close()
+    return rotated
+
+# 두 쪽 펼침 화면에서 가운데 접히는 부분(거터)의 x 좌표를 찾습니다.
+# 열마다 위아래 밝기의 표준편차를 구하면 글자가 있는 열은 크고, 빈 여백이나 세로 구분선은 작게 나옵니다.
+# 화면 가운데 부분(search_ratio)에서 가장 작은 값이 이어지는 구간의 가운데를 거터로 봅니다.
+def find_spread_gutter(img, search_ratio=0.3, max_side=512):
+    gray = analysis_array(img, max_side).mean(axis=2)
+    profile = gray.std(axis=0)
+    window = max(1, gray.shape[1] // 100)
+    profile = np.convolve(profile, np.ones(window) / window, mode='same')  # 글자 사이의 좁은 빈틈은 무시합니다.
+
+    width = gray.shape[1]
+    low = int(width * (0.5 - search_ratio / 2))
+    high = max(low + 1, int(width * (0.5 + search_ratio / 2)))
+    band = profile[low:high]
+    # 최솟값 근처의 열들을 연속한 구간으로 나누고, 최솟값이 들어 있는 구간의 가운데를 고릅니다.
+    valley = np.flatnonzero(band <= band.min() + 0.5)
+    breaks = np.flatnonzero(np.diff(valley) > 1)
+    starts = np.r_[valley[0], valley[breaks + 1]]
+    ends = np.r_[valley[breaks], valley[-1]]
+    best = np.searchsorted(ends, int(np.argmin(band)))
+    center = low + (starts[best] + ends[best]) / 2
+    return round((center + 0.5) * img.width / width)
+
+# 펼침 화면을 거터에서 왼쪽, 오른쪽 페이지로 나눕니다.
+def split_spread_page(img):
+    gutter = find_spread_gutter(img)
+    return [img.crop((0, 0, gutter, img.height)), img.crop((gutter, 0, img.width, img.height))]
+
+# 캡처 한 장을 목표 해상도에 맞춰 줄일 크기를 계산합니다. (펼침 화면은 한 쪽 크기를 기준으로 합니다.)
+def page_target_size(options):
+    page_count = 2 if options['split_spreads'] else 1
+    left, top, right, bottom = options['crop_box']
+    target_size = target_pixel_size((left, top, left + (right - left) // page_count, bottom),
+                                    options['pagesize'], options['target_dpi'])
+    if target_size and page_count > 1:
+        target_size = (target_size[0] * page_count, target_size[1])
+    return target_size
+
+# 캡처 한 장을 잘라서 읽고 기울기 보정, 배경 정리, 펼침 나누기까지 마친 PDF 페이지 이미지 목록을 돌려줍니다.
+# (PDF 생성과 목표 용량 표본이 같은 이미지를 인코딩하도록 함께 씁니다.)
+def load_page_images(source_bytes, options):
+    cropped_img = load_cropped_page(source_bytes, options['crop_box'], page_target_size(options))
+    if options['deskew']:
+        cropped_img = deskew_page(cropped_img)
+    if options['flatten_background']:
+        cropped_img = flatten_background(cropped_img)
+    if not options['split_spreads']:
+        return [cropped_img]
+    pages = split_spread_page(cropped_img)
+    cropped_img.close()
+    return pages
+
+# 목표 DPI로 용지에 배치했을 때 필요한 픽셀 크기를 계산합니다. (줄일 필요가 없으면 None)
+def target_pixel_size(crop_box, pagesize, target_dpi):
+    if not target_dpi:
+        return None
+    crop_width = crop_box[2] - crop_box[0]
+    crop_height = crop_box[3] - crop_box[1]
+    if crop_width <= 0 or crop_height <= 0:
+        return None
+    x, y, width, height = fit_image_to_page(crop_width, crop_height, pagesize[0], pagesize[1])
+    target_width = max(1, round(width / 72 * target_dpi))  # 1포인트 = 1/72인치
+    target_height = max(1, round(height / 72 * target_dpi))
+    if target_width >= crop_width or target_height >= crop_height:
+        return None  # 이미 목표 해상도 이하인 페이지는 그대로 둡니다.
+    return target_width, target_height
+
+# 원본을 열어 크롭하고, target_size가 있으면 그 크기로 줄입니다.
+# JPEG는 draft()로 디코딩할 때부터 1/2, 1/4, 1/8 크기로 읽고, 나머지는 reduce()로 정수배 축소한 뒤 마지막만 LANCZOS로 맞춥니다.
+def load_cropped_page(source_bytes, crop_box, target_size=None):
+    # 파일 핸들은 크롭 직후 바로 닫습니다. (페이지가 많아도 열린 파일이 쌓이지 않도록)
+    with Image.open(io.BytesIO(source_bytes)) as img:
+        if target_size and img.format == 'JPEG':
+            original_width, original_height = img.size
+            crop_width = crop_box[2] - crop_box[0]
+            crop_height = crop_box[3] - crop_box[1]
+            img.draft(img.mode, (math.ceil(target_size[0] * original_width / crop_width),
+                                 math.ceil(target_size[1] * original_height / crop_height)))
+            scale_x = img.width / original_width
+            scale_y = img.height / original_height
+            crop_box = (int(crop_box[0] * scale_x), int(crop_box[1] * scale_y),
+                        int(crop_box[2] * scale_x), int(crop_box[3] * scale_y))
+        cropped_img = img.crop(crop_box)
+
+    if target_size and cropped_img.size != target_size:
+        if cropped_img.mode not in ('RGB', 'L'):
+            cropped_img = cropped_img.convert('RGB')
+        factor = min(cropped_img.width // target_size[0], cropped_img.height // target_size[1])
+        if factor >= 2:
+            cropped_img = cropped_img.reduce(factor)  # 정수배 축소는 빠릅니다.
+        if cropped_img.size != target_size:
+            cropped_img = cropped_img.resize(target_size, Image.LANCZOS)
+    return cropped_img
+
+# JPEG 원본을 디코딩하지 않고 jpegtran으로 MCU 격자에 맞춰 잘라냅니다. (재압축 손실이 없습니다.)
+# 잘라낼 수 없는 JPEG(CMYK 등)이면 None을 돌려주고, 일반 경로(디코딩 → 크롭 → 인코딩)로 처리합니다.
+def crop_jpeg_lossless(source_bytes, crop_box, jpegtran_path):
+    with Image.open(io.BytesIO(source_bytes)) as img:  # 헤더만 읽습니다.
+        mode = img.mode
+        if mode not in ('RGB', 'L'):
+            return None
+        image_width, image_height = img.size
+        if mode == 'L':
+            mcu_width, mcu_height = 8, 8
+        else:
+            # get_sampling: 0 = 4:4:4, 1 = 4:2:2, 2 = 4:2:0
+            mcu_width, mcu_height = {0: (8, 8), 1: (16, 8), 2: (16, 16)}.get(JpegImagePlugin.get_sampling(img), (None, None))
+            if mcu_width is None:
+                return None
+
+    # 왼쪽/위쪽은 MCU 격자로 내려 맞추고, 오른쪽/아래쪽은 그대로 두어 선택한 영역이 잘리지 않게 합니다.
+    left, top, right, bottom = crop_box
+    left = max(0, left // mcu_width * mcu_width)
+    top = max(0, top // mcu_height * mcu_height)
+    right = min(right, image_width)
+    bottom = min(bottom, image_height)
+    if right <= left or bottom <= top:
+        return None
+
+    # jpegtran이 실패하거나(손상된 마커, 지원하지 않는 파일 등) 결과를 읽을 수 없으면 일반 경로로 처리합니다.
+    try:
+        result = subprocess.run(
+            [jpegtran_path, '-crop', f"{right - left}x{bottom - top}+{left}+{top}", '-copy', 'none', '-optimize'],
+            input=source_bytes, capture_output=True, check=True,
+            creationflags=getattr(subprocess, 'CREATE_NO_WINDOW', 0))  # Windows에서 콘솔 창이 뜨지 않게 합니다.
+        jpeg_bytes = result.stdout
+
+        with Image.open(io.BytesIO(jpeg_bytes)) as cropped:  # 잘라낸 크기를 헤더에서 확인합니다.
+            width, height = cropped.size
+    except (subprocess.CalledProcessError, OSError) as e:
+        logging.warning(f"jpegtran 무손실 자르기 실패, 다시 인코딩합니다: {str(e)}")
+        return None
+    return {
+        'data': jpeg_bytes,
+        'width': width,
+        'height': height,
+        'filter': 'DCTDecode',
+        'colorspace': 'DeviceGray' if mode == 'L' else 'DeviceRGB',
+        'bpc': 8,
+        'encoder': 'JPEG(무손실 자르기)',
+    }
+
+# 잘라낸 이미지를 PDF에 넣을 이미지 스트림으로 인코딩합니다.
+def encode_page_image(cropped_img, options):
+    page_class = None
+    if options['bilevel_text'] or options['grayscale_detect'] or options['auto_encoder'] or options['class_quality']:
+        page_class = classify_page(page_sample_array(cropped_img))
+
+    # 글자만 있는 페이지는 1비트 흑백으로 바꿔 CCITT G4로 압축합니다.
+    if options['bilevel_text'] and page_class == 'text' and not options['auto_encoder']:
+        page_image = encode_g4_image(cropped_img)
+        if page_image:
+            return page_image
+
+    # 색이 거의 없는 페이지는 한 채널(L, DeviceGray)로 저장합니다.
+    if options['grayscale_detect'] and page_class in ('text', 'gray'):
+        cropped_img = cropped_img.convert('L')
+
+    # JPEG로 저장할 수 없는 모드(RGBA, P 등)는 RGB로 바꿉니다.
+    if cropped_img.mode not in ('RGB', 'L'):
+        cropped_img = cropped_img.convert('RGB')
+
+    # 목표 용량 모드는 페이지 종류별로 정해 둔 품질을, 목표 SSIM 모드는 그 화질을 만족하는 가장 낮은 품질을 씁니다.
+    quality = options['compression_level']
+    if options['class_quality']:
+        quality = options['class_quality'].get(page_class, min(options['class_quality'].values()))
+    elif options['min_ssim']:
+        quality = jpeg_quality_for_ssim(cropped_img, options['min_ssim'], options)
+
+    if options['auto_encoder']:
+        return encode_smallest_image(cropped_img, page_class, quality, options)
+    page_image = encode_jpx_image(cropped_img, options['jpx_rate']) if options['jpx_rate'] else None
+    if page_image is None:
+        page_image = encode_jpeg_image(cropped_img, quality, options)
+
+    # MRC는 JPEG 한 장보다 작을 때만 씁니다. (글자가 없거나 사진만 있는 페이지는 JPEG가 더 작습니다.)
+    if options['mrc']:
+        mrc_image = encode_mrc_image(cropped_img, quality, options)
+        if mrc_image and len(mrc_image['data']) < len(page_image['data']):
+            return mrc_image
+    return page_image
+
+# JPEG는 파일 대신 메모리(BytesIO)에 만들어 바로 PDF에 넣습니다.
+def encode_jpeg_image(img, quality, options):
+    jpeg_buffer = io.BytesIO()
+    img.save(jpeg_buffer, format='JPEG', optimize=True, **jpeg_save_arguments(img.mode, quality, options))
+    return {
+        'data': jpeg_buffer.getvalue(),
+        'width': img.width,
+        'height': img.height,
+        'filter': 'DCTDecode',
+        'colorspace': 'DeviceGray' if img.mode == 'L' else 'DeviceRGB',
+        'bpc': 8,
+        'encoder': 'JPEG(흑백)' if img.mode == 'L' else 'JPEG',
+        'quality': quality,
+    }
+
+# JPEG 양자화 테이블 모음 (품질 50 기준 값, 8x8 행 순서). None은 libjpeg 기본 테이블입니다.
+# 'text': 높은 주파수를 기본 테이블보다 덜 깎아 글자 가장자리의 번짐(링잉)을 줄입니다.
+# 'flat': 모든 주파수를 같은 간격으로 나눕니다. (단색 면과 가는 선이 많은 화면 캡처에 유리합니다.)
+JPEG_QTABLE_PRESETS = {
+    'libjpeg': None,
+    'text': {'luma': [10 + 4 * (u + v) for u in range(8) for v in range(8)],
+             'chroma': [17 + 6 * (u + v) for u in range(8) for v in range(8)]},
+    'flat': {'luma': [16] * 64, 'chroma': [24] * 64},
+}
+
+# 품질 50 기준 테이블을 libjpeg와 같은 방식으로 품질에 맞게 늘리거나 줄입니다.
+def scaled_qtables(tables, quality, mode):
+    quality = min(100, max(1, quality))
+    scale = 5000 // quality if quality < 50 else 200 - quality * 2
+    scaled = [[min(255, max(1, (value * scale + 50) // 100)) for value in tables[name]] for name in ('luma', 'chroma')]
+    return scaled[:1] if mode == 'L' else scaled
+
+# Pillow의 JPEG 저장 인자를 만듭니다. (양자화 테이블과 색 샘플링 설정이 있으면 반영합니다.)
+def jpeg_save_arguments(mode, quality, options):
+    if options['jpeg_qtables']:
+        arguments = {'qtables': scaled_qtables(options['jpeg_qtables'], quality, mode)}
+    else:
+        arguments = {'quality': quality}
+    if options['jpeg_subsampling'] >= 0 and mode != 'L':
+        arguments['subsampling'] = options['jpeg_subsampling']  # 0: 4:4:4, 2: 4:2:0
+    return arguments
+
+# libjpeg 기본 테이블(품질 50 기준)을 읽어 옵니다. (품질 50으로 저장한 JPEG의 테이블이 기준 값 그대로입니다.)
+def libjpeg_base_qtables():
+    jpeg_buffer = io.BytesIO()
+    Image.new('RGB', (8, 8)).save(jpeg_buffer, format='JPEG', quality=50)
+    jpeg_buffer.seek(0)
+    with Image.open(jpeg_buffer) as img:
+        return {'luma': list(img.quantization[0]), 'chroma': list(img.quantization[1])}
+
+# 양자화 테이블 조정에서 한꺼번에 바꿔 볼 주파수 대역 (u+v 범위)과 배율
+QTABLE_TUNING_BANDS = ((0, 0), (1, 2), (3, 5), (6, 8), (9, 11), (12, 14))
+QTABLE_TUNING_FACTORS = (0.7, 0.85, 1.2, 1.5)
+
+# 표본 페이지에 맞춰 JPEG 양자화 테이블을 조정합니다. (오프라인 조정기)
+# libjpeg 기본 테이블에서 시작해 대역마다 간격을 키우거나 줄여 보고, 모든 표본이 기본 테이블로 저장했을 때의 SSIM을
+# 유지하면서(tolerance 이내) 전체 크기가 줄어드는 변경만 남깁니다.
+# samples: 표본 이미지 목록, 돌려주는 값: (테이블, 조정 후 크기, 기본 테이블 크기)
+def tune_jpeg_qtables(samples, quality, subsampling=-1, passes=2, tolerance=0.002, progress=None):
+    references = [np.asarray(sample.convert('L')) for sample in samples]
+
+    def measure(tables):
+        options = {'jpeg_qtables': tables, 'jpeg_subsampling': subsampling}
+        total = 0
+        scores = []
+        for sample, reference in zip(samples, references):
+            jpeg_buffer = io.BytesIO()
+            sample.save(jpeg_buffer, format='JPEG', optimize=True, **jpeg_save_arguments(sample.mode, quality, options))
+            total += jpeg_buffer.tell()
+            jpeg_buffer.seek(0)
+            with Image.open(jpeg_buffer) as decoded:
+                scores.append(ssim(reference, np.asarray(decoded.convert('L'))))
+        return total, scores
+
+    tables = libjpeg_base_qtables()
+    baseline_bytes, baseline_scores = measure(tables)
+    best_bytes = baseline_bytes
+    steps = passes * len(QTABLE_TUNING_BANDS) * 2
+    step = 0
+    for _ in range(passes):
+        for band_low, band_high in QTABLE_TUNING_BANDS:
+            band = [u * 8 + v for u in range(8) for v in range(8) if band_low <= u + v <= band_high]
+            for name in ('luma', 'chroma'):
+                step += 1
+                if progress:
+                    progress(step, steps)
+                for factor in QTABLE_TUNING_FACTORS:
+                    candidate = {key: list(values) for key, values in tables.items()}
+                    for position in band:
+                        candidate[name][position] = min(255, max(1, round(candidate[name][position] * factor)))
+                    total, scores = measure(candidate)
+                    if total < best_bytes and all(score >= baseline - tolerance
+                                                  for score, baseline in zip(scores, baseline_scores)):
+                        tables, best_bytes = candidate, total
+    return tables, best_bytes, baseline_bytes
+
+# JPEG 2000(JPX) 압축 설정: 이보다 높은 페이지는 이 높이의 띠로 나눠 스레드로 동시에 압축합니다. (띠마다 따로 배치)
+JPX_STRIP_HEIGHT = 1024
+JPX_TILE_SIZE = (512, 512)
+
+# JPEG 2000(JPXDecode) 스트림을 만듭니다. rate는 압축률(원본 크기 / 압축 크기)입니다.
+# measure가 True이면 다시 풀어서 PSNR도 계산합니다. (압축 방식 자동 선택용)
+def encode_jpx_image(img, rate, measure=False):
+    if not features.check('jpg_2000'):
+        return None
+    strips = [(top, min(img.height, top + JPX_STRIP_HEIGHT)) for top in range(0, img.height, JPX_STRIP_HEIGHT)]
+
+    def encode_strip(strip):
+        top, bottom = strip
+        region = img.crop((0, top, img.width, bottom)) if len(strips) > 1 else img
+        jpx_buffer = io.BytesIO()
+        region.save(jpx_buffer, format='JPEG2000', irreversible=True, quality_mode='rates', quality_layers=[rate],
+                    tile_size=JPX_TILE_SIZE if region.width >= JPX_TILE_SIZE[0] and region.height >= JPX_TILE_SIZE[1] else None)
+        squared_error = 0.0
+        if measure:
+            with Image.open(io.BytesIO(jpx_buffer.getvalue())) as decoded:
+                squared_error = float(np.sum((np.asarray(region, dtype=np.float32)
+                                              - np.asarray(decoded, dtype=np.float32)) ** 2))
+        return {
+            'data': jpx_buffer.getvalue(),
+            'width': region.width,
+            'height': region.height,
+            'filter': 'JPXDecode',
+            'colorspace': 'DeviceGray' if img.mode == 'L' else 'DeviceRGB',
+            'bpc': 8,
+            'bbox': (0, top, img.width, bottom),
+            'squared_error': squared_error,
+        }
+
+    # OpenJPEG는 압축하는 동안 GIL을 놓으므로 띠들을 스레드로 동시에 압축할 수 있습니다.
+    with ThreadPoolExecutor(max_workers=min(len(strips), os.cpu_count() or 1)) as pool:
+        layers = list(pool.map(encode_strip, strips))
+
+    page_image = {'width': img.width, 'height': img.height, 'encoder': 'JPEG 2000'}
+    if measure:
+        mse = sum(layer['squared_error'] for layer in layers) / (img.width * img.height * len(img.getbands()))
+        page_image['psnr'] = float('inf') if mse == 0 else float(10 * np.log10(255 * 255 / mse))
+    for layer in layers:
+        del layer['squared_error']
+    if len(layers) == 1:
+        del layers[0]['bbox']
+        page_image.update(layers[0])
+        return page_image
+    page_image['data'] = b"".join(layer['data'] for layer in layers)
+    for layer in layers:
+        layer['length'] = len(layer.pop('data'))
+    page_image['layers'] = layers
+    return page_image
+
+# MRC(글자/배경 분리) 압축 설정: 배경과 글자색 층을 줄이는 배율, 주변보다 이만큼 어두운 픽셀을 글자로 봅니다.
+MRC_BACKGROUND_FACTOR = 3
+MRC_FOREGROUND_FACTOR = 8
+MRC_TEXT_CONTRAST = 40
+
+# factor x factor 블록마다 weights가 True인 픽셀의 합과 개수를 구합니다. (크기가 나누어떨어지지 않으면 가장자리를 늘립니다.)
+def masked_block_sums(pixels, weights, factor):
+    pad_height = -pixels.shape[0] % factor
+    pad_width = -pixels.shape[1] % factor
+    pixels = np.pad(pixels, ((0, pad_height), (0, pad_width), (0, 0)), mode='edge')
+    weights = np.pad(weights, ((0, pad_height), (0, pad_width)), mode='edge')
+    shape = (pixels.shape[0] // factor, factor, pixels.shape[1] // factor, factor)
+    counts = weights.reshape(shape).sum(axis=(1, 3))
+    sums = (pixels * weights[..., None]).reshape(shape + (pixels.shape[2],)).sum(axis=(1, 3))
+    return sums, counts
+
+# 블록마다 weights가 True인 픽셀의 평균색으로 줄인 이미지를 만듭니다. (해당 픽셀이 없는 블록은 fallback 색)
+def masked_block_image(pixels, weights, factor, fallback, mode):
+    sums, counts = masked_block_sums(pixels, weights, factor)
+    means = np.where(counts[..., None] > 0, sums / np.maximum(counts, 1)[..., None], fallback)
+    means = np.clip(np.round(means), 0, 255).astype(np.uint8)
+    return Image.fromarray(means[..., 0] if mode == 'L' else means, mode)
+
+# 한 페이지를 세 층으로 나눠 압축합니다. (MRC)
+#  - 배경: 글자를 뺀 픽셀의 평균색으로 1/3 크기로 줄인 JPEG
+#  - 글자색: 글자 픽셀의 평균색으로 1/8 크기로 줄인 JPEG, 아래 글자 모양을 /Mask로 써서 글자 부분만 칠합니다.
+#  - 글자 모양: 원래 해상도의 1비트 마스크 (G4, libtiff가 없으면 Flate)
+# 층은 'layers'에 그리는 순서대로 적고, 스트림은 'data'에 이어 붙여 둡니다. (캐시와 크기 계산은 한 페이지와 같게 처리됩니다.)
+def encode_mrc_image(img, quality, options):
+    pixels = np.asarray(img, dtype=np.float32)
+    if pixels.ndim == 2:
+        pixels = pixels[..., None]
+    luma = pixels.mean(axis=2)
+
+    # 주변(1/8로 줄였다가 다시 키운 밝기)보다 확실히 어두운 픽셀을 글자로 봅니다. (사진의 어두운 면은 주변도 어두워 빠집니다.)
+    local = Image.fromarray(luma.astype(np.uint8)).reduce(MRC_FOREGROUND_FACTOR).resize(img.size, Image.BILINEAR)
+    text = (np.asarray(local, dtype=np.float32) - luma) > MRC_TEXT_CONTRAST
+    if not text.any() or text.mean() > 0.5:
+        return None
+
+    background = masked_block_image(pixels, ~text, MRC_BACKGROUND_FACTOR, pixels[~text].mean(axis=0), img.mode)
+    foreground = masked_block_image(pixels, text, MRC_FOREGROUND_FACTOR, pixels[text].mean(axis=0), img.mode)
+    mask_image = Image.fromarray(~text)  # 글자 = 0(검은색)
+    mask = encode_g4_stream(mask_image) if features.check('libtiff') else None
+    if mask is None:
+        data = zlib.compress(np.packbits(~text, axis=1).tobytes(), 9)
+        mask = {'data': data, 'width': img.width, 'height': img.height, 'filter': 'FlateDecode'}
+
+    layers = [encode_jpeg_image(background, quality, options), encode_jpeg_image(foreground, quality, options), mask]
+    background.close()
+    foreground.close()
+    layers[0]['interpolate'] = layers[1]['interpolate'] = True  # 줄인 층은 부드럽게 키워서 그리게 합니다.
+    layers[1]['mask'] = 2  # 글자색 층은 2번 층(글자 모양)으로 가립니다.
+    mask['image_mask'] = True  # 직접 그리지 않고 /Mask로만 씁니다.
+    data = b"".join(layer['data'] for layer in layers)
+    for layer in layers:
+        layer['length'] = len(layer.pop('data'))
+        layer.pop('encoder', None)
+        layer.pop('quality', None)
+    return {
+        'data': data,
+        'width': img.width,
+        'height': img.height,
+        'layers': layers,
+        'encoder': 'MRC',
+        'quality': quality,
+    }
+
+# 목표 SSIM 모드에서 찾을 JPEG 품질의 범위
+SSIM_QUALITY_RANGE = (10, 95)
+
+# 축소본에서 이분 탐색으로 목표 SSIM을 만족하는 가장 낮은 JPEG 품질을 찾습니다.
+# (빈 페이지는 낮은 품질로, 복잡한 도표는 높은 품질로 저장됩니다.)
+def jpeg_quality_for_ssim(img, min_ssim, options, max_side=1024):
+    factor = max(1, max(img.size) // max_side)
+    proxy = img.reduce(factor) if factor > 1 else img
+    reference = np.asarray(proxy.convert('L'))
+
+    low, high = SSIM_QUALITY_RANGE
+    best = high  # 가장 높은 품질로도 목표에 못 미치면 가장 높은 품질을 씁니다.
+    while low <= high:
+        quality = (low + high) // 2
+        jpeg_buffer = io.BytesIO()
+        proxy.save(jpeg_buffer, format='JPEG', **jpeg_save_arguments(proxy.mode, quality, options))
+        jpeg_buffer.seek(0)
+        with Image.open(jpeg_buffer) as decoded:
+            score = ssim(reference, np.asarray(decoded.convert('L')))
+        if score >= min_ssim:
+            best = quality
+            high = quality - 1
+        else:
+            low = quality + 1
+    return best
+
+# 두 회색조 배열의 SSIM을 8x8 블록 단위로 계산해 평균을 냅니다.
+# (여백처럼 평평한 블록은 점수가 항상 1에 가까워 평균을 부풀리므로 내용이 있는 블록만 평균합니다.)
+def ssim(reference, other, block=8):
+    height = reference.shape[0] // block * block
+    width = reference.shape[1] // block * block
+    if height == 0 or width == 0:
+        return 1.0
+    shape = (height // block, block, width // block, block)
+    a = reference[:height, :width].astype(np.float64).reshape(shape)
+    b = other[:height, :width].astype(np.float64).reshape(shape)
+    mean_a = a.mean(axis=(1, 3), keepdims=True)
+    mean_b = b.mean(axis=(1, 3), keepdims=True)
+    var_a = ((a - mean_a) ** 2).mean(axis=(1, 3))
+    var_b = ((b - mean_b) ** 2).mean(axis=(1, 3))
+    covariance = ((a - mean_a) * (b - mean_b)).mean(axis=(1, 3))
+    mean_a = mean_a[:, 0, :, 0]
+    mean_b = mean_b[:, 0, :, 0]
+    c1 = (0.01 * 255) ** 2
+    c2 = (0.03 * 255) ** 2
+    score = ((2 * mean_a * mean_b + c1) * (2 * covariance + c2)) / \
+            ((mean_a ** 2 + mean_b ** 2 + c1) * (var_a + var_b + c2))
+    content = var_a > 4
+    if not content.any():
+        return float(score.mean())
+    return float(score[content].mean())
+
+# 목표 용량 모드에서 시험할 JPEG 품질 단계
+SIZE_BUDGET_QUALITIES = (10, 20, 30, 40, 50, 60, 70, 80, 85, 90, 95)
+PAGE_CLASS_NAMES = {'text': '글자', 'gray': '회색조', 'color': '컬러'}
+
+# 책 전체에서 구간마다 하나씩 고르게 표본 페이지 번호를 고릅니다.
+def stratified_sample(total, count):
+    if total <= count:
+        return list(range(total))
+    return [int((k + 0.5) * total / count) for k in range(count)]
+
+# 표본 캡처 한 장을 품질 단계마다 인코딩해 PDF 페이지마다 (페이지 종류, {품질: 바이트 수})를 돌려줍니다. (오류가 나면 None)
+# (펼침 화면을 나누면 캡처 한 장에서 두 페이지가 나옵니다.)
+def sample_page_sizes(task):
+    img_path, options = task
+    try:
+        with open(img_path, 'rb') as f:
+            source_bytes = f.read()
+        results = []
+        for page in load_page_images(source_bytes, options):
+            page_class = classify_page(page_sample_array(page))
+            sizes = {}
+            for quality in SIZE_BUDGET_QUALITIES:
+                sample_options = dict(options, compression_level=quality, min_ssim=0, class_quality=None)
+                sizes[quality] = len(encode_page_image(page, sample_options)['data'])
+            page.close()
+            results.append((page_class, sizes))
+        return results
+    except Exception as e:
+        logging.error(f"표본 페이지 처리 중 오류 발생 {os.path.basename(img_path)}: {str(e)}")
+        return None
+
+# 표본 크기로 책 전체의 예상 크기를 세우고, 예산 안에서 페이지 종류별 JPEG 품질을 정합니다.
+# 종류마다 품질을 한 단계씩 번갈아 올리며(가장 낮은 종류부터, 같으면 늘어나는 크기가 작은 종류부터) 예산을 넘기 직전에 멈춥니다.
+# 돌려주는 값: ({종류: 품질}, 예상 바이트 수)
+def allocate_class_quality(samples, total_pages, budget_bytes):
+    qualities = SIZE_BUDGET_QUALITIES
+    sizes_by_class = {}
+    for page_class, sizes in samples:
+        sizes_by_class.setdefault(page_class, []).append(sizes)
+    # 종류별 예상 크기 = 표본 합계 × (전체 페이지 수 / 표본 수)
+    expected = {page_class: {quality: sum(sizes[quality] for sizes in class_sizes) * total_pages / len(samples)
+                             for quality in qualities}
+                for page_class, class_sizes in sizes_by_class.items()}
+    levels = {page_class: 0 for page_class in expected}
+
+    def expected_total():
+        return sum(expected[page_class][qualities[level]] for page_class, level in levels.items())
+
+    while True:
+        candidates = sorted((page_class for page_class in levels if levels[page_class] + 1 < len(qualities)),
+                            key=lambda page_class: (levels[page_class],
+                                                    expected[page_class][qualities[levels[page_class] + 1]]
+                                                    - expected[page_class][qualities[levels[page_class]]]))
+        for page_class in candidates:
+            levels[page_class] += 1
+            if expected_total() <= budget_bytes:
+                break
+            levels[page_class] -= 1
+        else:
+            break  # 어떤 종류도 더 올릴 수 없습니다.
+    class_quality = {page_class: qualities[levels[page_class]] for page_class in PAGE_CLASS_NAMES if page_class in levels}
+    return class_quality, expected_total()
+
+# 여러 압축 방식(JPEG, PNG 예측 Flate, 팔레트 Flate, G4)을 동시에 시험해서
+# 화질 기준(PSNR)을 만족하는 것 중 가장 작은 스트림을 고릅니다.
+def encode_smallest_image(img, page_class, quality, options):
+    encoders = [
+        lambda: encode_jpeg_image(img, quality, options),
+        lambda: encode_flate_image(img),
+        lambda: encode_palette_image(img),
+    ]
+    if options['bilevel_text'] and page_class == 'text':
+        encoders.append(lambda: encode_g4_image(img, measure=True))  # 흑백 압축을 켠 경우 글자 페이지만 G4를 후보로 넣습니다.
+    if options['jpx_rate']:
+        encoders.append(lambda: encode_jpx_image(img, options['jpx_rate'], measure=True))
+
+    # Pillow의 인코더는 GIL을 놓고 실행되므로 스레드로 동시에 시험할 수 있습니다.
+    with ThreadPoolExecutor(max_workers=len(encoders)) as pool:
+        candidates = [candidate for candidate in pool.map(lambda encode: encode(), encoders) if candidate]
+
+    reference = np.asarray(img)
+    accepted = []
+    for candidate in candidates:
+        if 'psnr' not in candidate:
+            if candidate['filter'] == 'DCTDecode':
+                with Image.open(io.BytesIO(candidate['data'])) as decoded:
+                    candidate['psnr'] = psnr(reference, np.asarray(decoded))
+            else:
+                candidate['psnr'] = float('inf')  # 무손실
+        if candidate['psnr'] >= options['min_psnr']:
+            accepted.append(candidate)
+    # PNG 예측 Flate는 무손실이므로 accepted가 비는 일은 없습니다.
+    return min(accepted, key=lambda candidate: len(candidate['data']))
+
+# 두 이미지 배열의 PSNR(dB)을 계산합니다. (같으면 무한대)
+def psnr(reference, other):
+    mse = np.mean((reference.astype(np.float32) - other.astype(np.float32)) ** 2)
+    return float('inf') if mse == 0 else float(10 * np.log10(255 * 255 / mse))
+
+# PNG 파일에서 IDAT(행마다 예측 필터가 붙은 zlib 스트림)와 헤더 정보를 꺼냅니다.
+# 이 스트림은 PDF의 FlateDecode + /Predictor 15와 같은 형식이라 그대로 넣을 수 있습니다.
+def read_png_stream(png_bytes):
+    position = 8  # PNG 시그니처
+    idat = []
+    bit_depth = None
+    palette = None
+    while position < len(png_bytes):
+        length, chunk_type = struct.unpack('>I4s', png_bytes[position:position + 8])
+        chunk = png_bytes[position + 8:position + 8 + length]
+        if chunk_type == b'IHDR':
+            bit_depth = chunk[8]
+        elif chunk_type == b'PLTE':
+            palette = chunk
+        elif chunk_type == b'IDAT':
+            idat.append(chunk)
+        elif chunk_type == b'IEND':
+            break
+        position += 12 + length
+    return b"".join(idat), bit_depth, palette
+
+# PNG 예측 필터를 쓴 Flate(무손실) 스트림을 만듭니다.
+def encode_flate_image(img):
+    png_buffer = io.BytesIO()
+    img.save(png_buffer, format='PNG', compress_level=9)
+    data, bit_depth, palette = read_png_stream(png_buffer.getvalue())
+    colors = 1 if img.mode == 'L' else 3
+    return {
+        'data': data,
+        'width': img.width,
+        'height': img.height,
+        'filter': 'FlateDecode',
+        'decode_parms': f"<< /Predictor 15 /Colors {colors} /BitsPerComponent {bit_depth} /Columns {img.width} >>",
+        'colorspace': 'DeviceGray' if img.mode == 'L' else 'DeviceRGB',
+        'bpc': bit_depth,
+        'encoder': 'Flate',
+        'psnr': float('inf'),
+    }
+
+# 256색 이하 팔레트(인덱스 색상)로 바꾼 Flate 스트림을 만듭니다. (색이 적은 스크린샷에 유리합니다.)
+def encode_palette_image(img):
+    if img.mode == 'L':
+        return None  # 회색조는 이미 한 채널이므로 팔레트로 줄어들지 않습니다.
+    exact = img.getcolors(256) is not None  # 256색 이하이면 색 손실 없이 바꿀 수 있습니다.
+    indexed = img.quantize(colors=256, method=Image.MEDIANCUT if exact else Image.FASTOCTREE)
+    png_buffer = io.BytesIO()
+    indexed.save(png_buffer, format='PNG', compress_level=9)
+    data, bit_depth, palette = read_png_stream(png_buffer.getvalue())
+    if not palette:
+        return None
+    color_count = len(palette) // 3
+    return {
+        'data': data,
+        'width': img.width,
+        'height': img.height,
+        'filter': 'FlateDecode',
+        'decode_parms': f"<< /Predictor 15 /Colors 1 /BitsPerComponent {bit_depth} /Columns {img.width} >>",
+        'colorspace': f"[/Indexed /DeviceRGB {color_count - 1} <{palette.hex()}>]",
+        'bpc': bit_depth,
+        'encoder': '팔레트 Flate',
+        'psnr': psnr(np.asarray(img), np.asarray(indexed.convert('RGB'))),
+    }
+
+# 페이지 분석용으로 긴 변이 max_side 이하가 되게 줄인 RGB 배열을 만듭니다.
+def analysis_array(img, max_side=512):
+    if img.mode != 'RGB':
+        img = img.convert('RGB')
+    factor = max(1, max(img.size) // max_side)
+    if factor > 1:
+        img = img.reduce(factor)
+    return np.asarray(img, dtype=np.uint8)
+
+# 페이지 종류 판단용으로 원본 해상도의 픽셀을 일정 간격으로 골라 낸 RGB 배열을 만듭니다.
+# (analysis_array처럼 줄이면 글자 획이 중간 밝기로 뭉개져서 글자 페이지가 회색조로 잘못 판단됩니다.)
+def page_sample_array(img, max_side=512):
+    if img.mode != 'RGB':
+        img = img.convert('RGB')
+    step = max(1, max(img.size) // max_side)
+    return np.asarray(img, dtype=np.uint8)[::step, ::step]
+
+# 페이지 종류를 판단합니다. 'text'(글자만 있는 흑백), 'gray'(색이 거의 없음), 'color'(컬러)
+def classify_page(rgb):
+    if not is_grayscale_page(rgb):
+        return 'color'
+    return 'text' if is_text_page(rgb) else 'gray'
+
+# 색감(colourfulness, Hasler-Süsstrunk 지표)을 계산합니다. 0이면 완전한 회색조입니다.
+def colorfulness(rgb):
+    r, g, b = (rgb[..., channel].astype(np.float32) for channel in range(3))
+    rg = r - g
+    yb = 0.5 * (r + g) - b
+    return float(np.sqrt(rg.std() ** 2 + yb.std() ** 2) + 0.3 * np.sqrt(rg.mean() ** 2 + yb.mean() ** 2))
+
+# 색이 거의 없는 페이지인지 판단합니다.
+# 전체 색감이 낮더라도 작은 컬러 그림(로고, 밑줄 등)이 있으면 컬러로 둡니다.
+def is_grayscale_page(rgb, colorfulness_limit=4.0, chroma_limit=32, color_fraction=0.001):
+    if colorfulness(rgb) >= colorfulness_limit:
+        return False
+    chroma = rgb.max(axis=2).astype(np.int16) - rgb.min(axis=2)
+    return np.count_nonzero(chroma > chroma_limit) <= color_fraction * chroma.size
+
+# 글자만 있는 페이지(흰 바탕의 검은 글자 등)인지 판단합니다.
+# 색이 있는 픽셀이 거의 없고, 중간 밝기(글자 가장자리의 안티에일리어싱 정도) 픽셀이 적으면 글자 페이지로 봅니다.
+def is_text_page(rgb, chroma_limit=24, color_fraction=0.01, midtone_fraction=0.08):
+    chroma = rgb.max(axis=2).astype(np.int16) - rgb.min(axis=2)
+    if np.count_nonzero(chroma > chroma_limit) > color_fraction * chroma.size:
+        return False
+    gray = rgb.mean(axis=2)
+    midtones = np.count_nonzero((gray > 64) & (gray < 192))
+    return midtones <= midtone_fraction * gray.size
+
+# 오츠(Otsu) 방법으로 흑백 이미지의 이진화 기준값을 구합니다.
+def otsu_threshold(gray):
+    histogram = np.bincount(gray.ravel(), minlength=256).astype(np.float64)
+    weights = np.cumsum(histogram)  # 기준값 이하 픽셀 수
+    sums = np.cumsum(histogram * np.arange(256))
+    total_weight, total_sum = weights[-1], sums[-1]
+    background = total_weight - weights
+    valid = (weights > 0) & (background > 0)
+    mean_low = np.where(valid, sums / np.maximum(weights, 1), 0)
+    mean_high = np.where(valid, (total_sum - sums) / np.maximum(background, 1), 0)
+    between = np.where(valid, weights * background * (mean_low - mean_high) ** 2, 0)
+    return int(np.argmax(between))
+
+# 1비트 흑백으로 바꿔 CCITT G4 스트림을 만듭니다. (Pillow의 libtiff로 TIFF를 만든 뒤 스트립만 꺼냅니다.)
+# measure가 True이면 흑백으로 바꾼 결과의 PSNR도 계산합니다. (압축 방식 자동 선택용)
+def encode_g4_image(cropped_img, measure=False):
+    if not features.check('libtiff'):
+        return None
+    gray = cropped_img.convert('L')
+    threshold = otsu_threshold(np.asarray(gray))
+    bilevel = gray.point(lambda v: 255 if v > threshold else 0, mode='1')
+    page_image = encode_g4_stream(bilevel)
+    if page_image:
+        page_image['encoder'] = 'G4'
+        if measure:
+            page_image['psnr'] = psnr(np.asarray(cropped_img), np.asarray(bilevel.convert(cropped_img.mode)))
+    return page_image
+
+# 1비트 이미지(mode '1', 검은색 = 0)를 CCITT G4 스트림으로 만듭니다. (스트립이 나뉘면 None)
+def encode_g4_stream(bilevel):
+    tiff_buffer = io.BytesIO()
+    bilevel.save(tiff_buffer, format='TIFF', compression='group4', strip_size=2 ** 30)  # 한 스트립으로 저장합니다.
+    tiff_bytes = tiff_buffer.getvalue()
+    with Image.open(io.BytesIO(tiff_bytes)) as tiff:
+        offsets = tiff.tag_v2.get(273)  # StripOffsets
+        counts = tiff.tag_v2.get(279)  # StripByteCounts
+    if not offsets or len(offsets) != 1:
+        return None  # 스트립이 나뉜 경우(오래된 Pillow)는 JPEG로 처리합니다.
+    return {
+        'data': tiff_bytes[offsets[0]:offsets[0] + counts[0]],
+        'width': bilevel.width,
+        'height': bilevel.height,
+        'filter': 'CCITTFaxDecode',
+        'decode_parms': f"<< /K -1 /Columns {bilevel.width} /Rows {bilevel.height} /BlackIs1 true >>",
+        'colorspace': 'DeviceGray',
+        'bpc': 1,
+    }
+
 # 매크로 실행 중지 관련 
 class MacroThread(QThread):
     message_signal = pyqtSignal(str, str)  # 메시지를 전달하기 위한 시그널
@@ -104,6 +1447,587 @@ class MacroThread(QThread):
         self.macro_running = False
 
 
+# PDF 생성 작업을 GUI 스레드 밖에서 실행하는 스레드 (MacroThread와 같은 방식으로 시그널을 사용합니다.)
+class PdfBuildThread(QThread):
+    message_signal = pyqtSignal(str, str)  # 메시지를 전달하기 위한 시그널
+    progress_signal = pyqtSignal(int)  # 진행상황을 전달하기 위한 시그널
+    progress_label_signal = pyqtSignal(str)  # 라벨(진행 수, 남은 시간) 업데이트를 위한 시그널
+    page_error_signal = pyqtSignal(list)  # 오류가 난 페이지 목록 [(파일명, 오류 내용), ...]을 모아서 전달하는 시그널
+    build_finished_signal = pyqtSignal(str, int, bool, str)  # (PDF 경로, 오류 페이지 수, 중지 여부, 생성 결과 요약)
+
+    update_interval = 0.2  # 시그널을 보내는 최소 간격(초), 페이지마다 보내면 화면이 끊깁니다.
+    inflight_per_worker = 2  # 작업 프로세스마다 미리 넣어 둘 페이지 수 (결과가 쌓이지 않도록 제한합니다.)
+    memory_check_interval = 0.5  # 메모리 사용량을 확인하는 간격(초)
+    budget_sample_pages = 24  # 목표 용량 모드에서 미리 인코딩해 볼 표본 페이지 수
+    budget_margin = 0.05  # 예측 오차에 대비해 목표 용량에서 남겨 둘 비율
+    page_overhead_bytes = 400  # 페이지마다 이미지 외에 들어가는 PDF 객체의 대략적인 크기
+    plan_chunk_pages = 64  # 미리 처리하는 작업을 나눠 실행할 페이지 수 (이만큼 처리할 때마다 중지 요청을 확인합니다.)
+    crop_thumbnail_side = 512  # 페이지별 크롭에서 내용 영역을 찾을 축소본의 긴 변 길이(픽셀)
+    crop_threshold = 32  # 배경과 이만큼 이상 밝기가 다른 픽셀을 내용으로 봅니다.
+    crop_padding = 8  # 내용 영역 바깥으로 남길 여백(원본 픽셀)
+
+    # images: 페이지 순서대로 (파일명, 내용 해시) 목록 (해시는 매니페스트 값이며 None이면 작업 함수에서 계산합니다.)
+    def __init__(self, parent=None, pdf_path=None, image_folder=None, images=None, crop_box=None,
+                 save_dir=None, compression_level=85, pagesize=A4, workers=1, memory_limit_mb=0,
+                 cache_dir=None, cache_size_mb=0, jpegtran_path=None, target_dpi=0, bilevel_text=False,
+                 grayscale_detect=False, auto_encoder=False, min_psnr=35, min_ssim=0, target_size_mb=0,
+                 adaptive_crop=False, split_spreads=False, deskew=False, flatten_background=False, mrc=False,
+                 jpx_rate=0, jpeg_qtables=None, jpeg_subsampling=-1):
+        super().__init__(parent)
+        self.parent = parent
+        self.pdf_path = pdf_path
+        self.image_folder = image_folder
+        self.images = images or []
+        self.crop_box = crop_box
+        self.save_dir = save_dir
+        self.compression_level = compression_level
+        self.pagesize = pagesize
+        self.workers = workers
+        self.memory_limit_mb = memory_limit_mb  # 메모리 사용량 상한(MB), 0이면 제한하지 않습니다.
+        self.peak_rss_mb = 0  # 생성 중 확인한 최대 메모리 사용량(MB)
+        self.cache_dir = cache_dir if cache_size_mb else None  # 페이지 캐시 폴더 (크기가 0이면 캐시를 쓰지 않습니다.)
+        self.cache_size_mb = cache_size_mb
+        self.jpegtran_path = jpegtran_path  # JPEG 무손실 자르기에 사용할 jpegtran 경로 (None이면 사용하지 않습니다.)
+        self.target_dpi = target_dpi  # 목표 해상도(DPI), 0이면 원본 크기 그대로 넣습니다.
+        self.bilevel_text = bilevel_text  # 글자 페이지를 1비트 흑백(CCITT G4)으로 압축할지 여부
+        self.grayscale_detect = grayscale_detect  # 색이 거의 없는 페이지를 한 채널(회색조)로 저장할지 여부
+        self.auto_encoder = auto_encoder  # 페이지마다 가장 작은 압축 방식을 고를지 여부
+        self.min_psnr = min_psnr  # 압축 방식 자동 선택 시 허용하는 최소 화질(PSNR, dB)
+        # JPEG 2000은 품질을 쓰지 않으므로 목표 SSIM, 목표 용량 모드를 함께 쓰지 않습니다. (표본을 인코딩해도 크기가 같습니다.)
+        self.min_ssim = 0 if jpx_rate else min_ssim  # 페이지마다 JPEG 품질을 정할 목표 SSIM (0이면 압축 수준을 그대로 사용)
+        self.target_size_mb = 0 if jpx_rate else target_size_mb  # PDF 목표 용량(MB), 0이면 사용하지 않습니다.
+        self.adaptive_crop = adaptive_crop  # 크롭 영역 안에서 페이지마다 내용 위치에 맞춰 자를지 여부
+        self.crop_table = None  # 페이지별 크롭 영역 목록 (페이지마다 자르는 경우에만 만듭니다.)
+        self.split_spreads = split_spreads  # 두 쪽 펼침 화면을 왼쪽/오른쪽 페이지로 나눌지 여부
+        self.deskew = deskew  # 기울어진 페이지를 바로 세울지 여부
+        self.flatten_background = flatten_background  # 배경의 질감과 잡티를 순백(어두운 테마는 검정)으로 정리할지 여부
+        self.mrc = mrc  # 글자와 배경을 나눠 층으로 압축(MRC)할지 여부
+        self.jpx_rate = jpx_rate  # JPEG 2000 압축률 (0이면 JPEG를 씁니다.)
+        self.jpeg_qtables = jpeg_qtables  # JPEG 양자화 테이블 {'luma', 'chroma'} (품질 50 기준, None이면 libjpeg 기본)
+        self.jpeg_subsampling = jpeg_subsampling  # JPEG 색 샘플링 (-1: 기본, 0: 4:4:4, 2: 4:2:0)
+        self.build_running = True
+
+    def run(self):
+        total_steps = len(self.images)
+        error_count = 0
+        pending_errors = []  # 아직 화면에 보내지 않은 오류 목록
+        last_update = 0.0
+        start_time = time.time()
+
+        pdf_writer = None
+        page_cache = None
+        encoder_counts = {}  # 인코딩 방식별 페이지 수
+        page_encoders = []  # 페이지별 (파일명, 인코딩 방식, 크기) 목록 (자동 선택 보고서용)
+        jpeg_qualities = []  # 목표 SSIM 모드에서 페이지마다 정해진 JPEG 품질
+        try:
+            # JPEG 2000(JPXDecode)은 PDF 1.5부터 쓸 수 있습니다.
+            pdf_writer = StreamingPdfWriter(self.pdf_path, pagesize=self.pagesize, version="1.5" if self.jpx_rate else "1.4")
+            if self.cache_dir:
+                page_cache = PageCache(self.cache_dir, self.cache_size_mb)
+
+            # 작업 프로세스 수 (1이면 현재 스레드에서 순서대로 처리)
+            workers = max(1, min(self.workers, total_steps))
+
+            # 잘라낸 이미지(PNG)를 따로 저장하는 경우에만 디렉토리를 만듭니다.
+            if self.save_dir:
+                os.makedirs(self.save_dir, exist_ok=True)
+
+            # 작업 목록도 한꺼번에 만들지 않고 필요할 때 하나씩 만듭니다. (스캔 → 디코딩/크롭/인코딩 → 쓰기)
+            options = self.page_options()
+            tasks = ((i, os.path.join(self.image_folder, img_file), source_hash, self.page_task_options(i, options))
+                     for i, (img_file, source_hash) in enumerate(self.images))
+
+            executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+            try:
+                # 페이지마다 자르는 경우 모든 페이지의 내용 영역을 먼저 찾아 크롭 표를 만듭니다.
+                if self.adaptive_crop:
+                    self.crop_table = self.plan_page_crops(executor)
+
+                # 목표 용량이 있으면 표본 페이지로 페이지 종류별 품질을 먼저 정합니다. (한 번의 생성으로 용량을 맞춥니다.)
+                if self.target_size_mb and self.build_running:
+                    options['class_quality'], budget_estimate = self.plan_size_budget(executor, options)
+
+                # 결과는 페이지 순서대로 돌아옵니다. (작업 프로세스가 없으면 현재 스레드에서 한 페이지씩 처리합니다.)
+                results = self.iter_page_results(executor, tasks, workers * self.inflight_per_worker if executor else 1)
+
+                for i, img_file, page_images, error in results:
+                    try:
+                        if error:
+                            raise Exception(error)
+
+                        for page_image in page_images:
+                            pdf_writer.add_image_page(page_image)  # 페이지를 바로 PDF 파일에 씁니다.
+                            encoder_counts[page_image['encoder']] = encoder_counts.get(page_image['encoder'], 0) + 1
+                            if self.min_ssim and 'quality' in page_image:
+                                jpeg_qualities.append(page_image['quality'])
+                            if self.auto_encoder:
+                                page_encoders.append((img_file, page_image['encoder'], len(page_image['data'])))
+
+                            if page_cache:
+                                # 캐시 기록에 실패해도 페이지는 이미 PDF에 들어갔으므로 오류 페이지로 세지 않습니다.
+                                try:
+                                    if page_image['cache_hit']:
+                                        page_cache.record_hit(page_image['cache_key'])
+                                    else:
+                                        page_cache.store(page_image['cache_key'], page_image)
+                                except OSError as e:
+                                    logging.warning(f"페이지 캐시 기록 실패 {img_file}: {str(e)}")
+
+                    except Exception as e:
+                        logging.error(f"이미지 처리 중 오류 발생 {img_file}: {str(e)}")
+                        pending_errors.append((img_file, str(e)))
+                        error_count += 1
+
+                    # 진행 상황과 오류는 update_interval 마다 모아서 보냅니다.
+                    now = time.time()
+                    if now - last_update >= self.update_interval or i + 1 == total_steps:
+                        last_update = now
+                        self.emit_progress(i + 1, total_steps, img_file, now - start_time)
+                        if pending_errors:
+                            self.page_error_signal.emit(pending_errors)
+                            pending_errors = []
+
+                    if not self.build_running:
+                        break  # 중지 요청이 있으면 남은 페이지를 처리하지 않습니다.
+            finally:
+                if executor:
+                    executor.shutdown(cancel_futures=True)
+
+            if pending_errors:
+                self.page_error_signal.emit(pending_errors)
+
+            if page_cache:
+                page_cache.save_index()  # 중지된 경우에도 지금까지 만든 페이지는 다음에 재사용합니다.
+
+            if not self.build_running:
+                pdf_writer.abort()  # 중지된 경우 만들다 만 PDF는 지웁니다.
+                self.build_finished_signal.emit("", error_count, True, "")
+                return
+
+            pdf_writer.close()
+
+            # 생성 결과 요약
+            report = []
+            if encoder_counts:
+                report.append("인코딩: " + ", ".join(f"{encoder} {count}개" for encoder, count in encoder_counts.items()))
+            if self.crop_table:
+                crop_left, crop_top, crop_right, crop_bottom = self.crop_table[0]
+                report.append(f"페이지별 크롭: {crop_right - crop_left}x{crop_bottom - crop_top} 픽셀"
+                              f" (크롭 영역 {self.crop_box[2] - self.crop_box[0]}x{self.crop_box[3] - self.crop_box[1]})")
+            if options['class_quality']:
+                report.append(f"목표 용량 {self.target_size_mb}MB: JPEG 품질 "
+                              + ", ".join(f"{PAGE_CLASS_NAMES[page_class]} {quality}"
+                                          for page_class, quality in options['class_quality'].items())
+                              + f" (예상 {budget_estimate / 1048576:.1f}MB, 실제 {os.path.getsize(self.pdf_path) / 1048576:.1f}MB)")
+                if budget_estimate > self.target_size_mb * 1048576:
+                    report.append("가장 낮은 품질로도 목표 용량을 넘습니다. 목표 해상도(DPI)를 낮춰 보세요.")
+            if jpeg_qualities:
+                report.append(f"목표 SSIM {self.min_ssim}: JPEG 품질 평균 {sum(jpeg_qualities) / len(jpeg_qualities):.0f}"
+                              f" (최소 {min(jpeg_qualities)}, 최대 {max(jpeg_qualities)})")
+            if page_encoders:
+                report_path = os.path.splitext(self.pdf_path)[0] + "_encoders.txt"
+                with open(report_path, 'w', encoding='utf-8') as f:
+                    for page_number, (img_file, encoder, size) in enumerate(page_encoders, 1):
+                        f.write(f"{page_number}\t{img_file}\t{encoder}\t{size}\n")
+                report.append(f"페이지별 압축 방식: {report_path}")
+            if pdf_writer.reused_images:
+                report.append(f"같은 이미지 재사용: {pdf_writer.reused_images}개 (한 번만 저장)")
+            if page_cache:
+                report.append(f"페이지 캐시: 재사용 {page_cache.hits}개, 새로 만듦 {page_cache.misses}개")
+            if self.memory_limit_mb and self.peak_rss_mb:  # psutil이 없으면 사용량을 잴 수 없습니다.
+                report.append(f"최대 메모리 사용량: {self.peak_rss_mb:.0f}MB (상한 {self.memory_limit_mb}MB)")
+            for line in report:
+                logging.info(line)
+            self.build_finished_signal.emit(self.pdf_path, error_count, False, "\n".join(report))
+
+        except Exception as e:
+            error_msg = f"PDF 생성 중 오류가 발생했습니다: {str(e)}\n\n"
+            error_msg += traceback.format_exc()
+            if pdf_writer:
+                pdf_writer.abort()
+            self.message_signal.emit("오류", error_msg)
+            logging.error(error_msg)
+            self.build_finished_signal.emit("", error_count, False, "")
+
+    # 작업 프로세스에 넘길 페이지 처리 설정
+    def page_options(self):
+        return {
+            'crop_box': self.crop_box,
+            'save_dir': self.save_dir,
+            'compression_level': self.compression_level,
+            'pagesize': tuple(self.pagesize),
+            'cache_dir': self.cache_dir,
+            'jpegtran_path': self.jpegtran_path,
+            'target_dpi': self.target_dpi,
+            'bilevel_text': self.bilevel_text,
+            'grayscale_detect': self.grayscale_detect,
+            'auto_encoder': self.auto_encoder,
+            'min_psnr': self.min_psnr,
+            'min_ssim': self.min_ssim,
+            'class_quality': None,
+            'split_spreads': self.split_spreads,
+            'deskew': self.deskew,
+            'flatten_background': self.flatten_background,
+            'mrc': self.mrc,
+            'jpx_rate': self.jpx_rate,
+            'jpeg_qtables': self.jpeg_qtables,
+            'jpeg_subsampling': self.jpeg_subsampling,
+        }
+
+    # 페이지 번호에 맞는 처리 설정 (페이지별 크롭 표가 있으면 그 페이지의 크롭 영역으로 바꿉니다.)
+    def page_task_options(self, index, options):
+        if not self.crop_table:
+            return options
+        return dict(options, crop_box=self.crop_table[index])
+
+    # 미리 처리하는 작업(크롭 표, 목표 용량 표본)을 plan_chunk_pages 개씩 나눠 실행해서 중지 요청을 바로 반영합니다.
+    # (중지되면 지금까지의 결과만 돌려줍니다.)
+    def map_in_chunks(self, executor, function, tasks, label):
+        results = []
+        for start in range(0, len(tasks), self.plan_chunk_pages):
+            if not self.build_running:
+                break
+            self.progress_label_signal.emit(f"{label}: {start}/{len(tasks)}")
+            chunk = tasks[start:start + self.plan_chunk_pages]
+            results.extend(executor.map(function, chunk) if executor else map(function, chunk))
+        return results
+
+    def plan_page_crops(self, executor):
+        tasks = [(os.path.join(self.image_folder, img_file), self.crop_box, self.crop_thumbnail_side, self.crop_threshold)
+                 for img_file, source_hash in self.images]
+        content_boxes = self.map_in_chunks(executor, detect_page_content_box, tasks, "페이지별 내용 영역 찾는 중")
+        if not self.build_running:
+            return None
+        return fit_crop_envelope(content_boxes, self.crop_box, self.crop_padding)
+
+    def plan_size_budget(self, executor, options):
+        sample = stratified_sample(len(self.images), self.budget_sample_pages)
+        sample_tasks = [(os.path.join(self.image_folder, self.images[i][0]), self.page_task_options(i, options)) for i in sample]
+        results = [result for result in self.map_in_chunks(executor, sample_page_sizes, sample_tasks,
+                                                           "목표 용량 계획 중, 표본 페이지 인코딩") if result]
+        if not self.build_running:
+            return None, 0
+        if not results:
+            raise Exception("목표 용량을 계산할 표본 페이지를 읽지 못했습니다.")
+        return self.allocate_budget(results)
+
+    # 표본 크기로 목표 용량에 맞는 페이지 종류별 품질과 예상 용량(바이트)을 정합니다.
+    # results: 표본 캡처마다 sample_page_sizes가 돌려준 PDF 페이지 목록
+    def allocate_budget(self, results):
+        samples = [sample for result in results for sample in result]
+        total_pages = len(self.images) * len(samples) / len(results)  # 펼침을 나누면 PDF 페이지 수가 캡처 수보다 많습니다.
+        budget_bytes = self.target_size_mb * 1048576 * (1 - self.budget_margin) - total_pages * self.page_overhead_bytes
+        class_quality, estimate = allocate_class_quality(samples, total_pages, budget_bytes)
+        return class_quality, estimate + total_pages * self.page_overhead_bytes
+
+    def iter_page_results(self, executor, tasks, max_inflight):
+        # 작업을 한꺼번에 넣지 않고 max_inflight 개까지만 넣어 둡니다.
+        # PDF 쓰기가 늦어지면 새 작업을 넣지 않으므로(역압) 처리 결과가 메모리에 쌓이지 않습니다.
+        # executor가 None이면 작업을 현재 스레드에서 처리하고, 메모리 사용량 확인은 똑같이 합니다.
+        inflight = deque()
+        last_memory_check = 0.0
+        over_limit = False
+        while True:
+            if self.memory_limit_mb and time.time() - last_memory_check >= self.memory_check_interval:
+                last_memory_check = time.time()
+                rss_mb = process_tree_rss_mb()
+                self.peak_rss_mb = max(self.peak_rss_mb, rss_mb)
+                over_limit = rss_mb > self.memory_limit_mb
+                if over_limit:
+                    gc.collect()
+
+            # 메모리 상한을 넘으면 앞의 결과를 다 쓸 때까지 한 페이지씩만 처리합니다.
+            limit = 1 if over_limit else max_inflight
+            while self.build_running and len(inflight) < limit:
+                task = next(tasks, None)
+                if task is None:
+                    break
+                inflight.append(executor.submit(process_page_image, task) if executor else task)
+
+            if not inflight:
+                return
+            item = inflight.popleft()  # 작업 프로세스가 있으면 future, 없으면 작업(task)입니다.
+            yield item.result() if executor else process_page_image(item)
+            del item  # 다 쓴 결과는 바로 놓아줍니다.
+
+    def emit_progress(self, done, total_steps, img_file, elapsed):
+        # 지금까지의 처리 속도로 남은 시간을 계산합니다.
+        remaining = elapsed / done * (total_steps - done)
+        self.progress_signal.emit(done)
+        self.progress_label_signal.emit(f"처리 중: {done}/{total_steps} (남은 시간 약 {format_duration(remaining)})\n{img_file}")
+
+    def stop(self):
+        self.build_running = False
+
+
+# 현재 설정으로 만들 PDF의 용량과 생성 시간을 미리 계산하는 스레드
+# (PdfBuildThread의 설정을 그대로 쓰고, 책 전체에서 고르게 고른 표본 페이지만 인코딩해서 전체로 늘려 계산합니다.)
+class EstimateThread(PdfBuildThread):
+    estimate_signal = pyqtSignal(str)  # 예상 결과 문장
+
+    estimate_sample_pages = 12  # 인코딩해 볼 표본 페이지 수
+
+    def run(self):
+        try:
+            total_pages = len(self.images)
+            sample = stratified_sample(total_pages, self.estimate_sample_pages)
+            options = self.page_options()
+            options['save_dir'] = None
+            options['cache_dir'] = None  # 캐시를 쓰지 않아야 실제 인코딩 시간을 잴 수 있습니다.
+
+            # 페이지마다 자르는 경우 표본 페이지만으로 크롭 표를 만들어 씁니다.
+            if self.adaptive_crop:
+                content_boxes = [detect_page_content_box((os.path.join(self.image_folder, self.images[i][0]), self.crop_box,
+                                                          self.crop_thumbnail_side, self.crop_threshold)) for i in sample]
+                self.crop_table = dict(zip(sample, fit_crop_envelope(content_boxes, self.crop_box, self.crop_padding)))
+            workers = max(1, min(self.workers, total_pages, os.cpu_count() or 1))
+
+            # 목표 용량이 있으면 실제 생성과 같이 표본 페이지로 페이지 종류별 품질을 먼저 정하고, 그 품질로 인코딩해 봅니다.
+            # (실제 생성은 budget_sample_pages 개의 표본을 품질 단계마다 인코딩하므로 그 시간도 더합니다.)
+            budget_seconds = 0.0
+            if self.target_size_mb:
+                start_time = time.perf_counter()
+                results = [result for result in (sample_page_sizes((os.path.join(self.image_folder, self.images[i][0]),
+                                                                    self.page_task_options(i, options))) for i in sample) if result]
+                if results:
+                    options['class_quality'] = self.allocate_budget(results)[0]
+                    budget_seconds = ((time.perf_counter() - start_time) / len(sample)
+                                      * min(self.budget_sample_pages, total_pages) / workers)
+
+            sizes = []
+            seconds = []
+            for i in sample:
+                if not self.build_running:
+                    return  # 창을 닫는 중입니다.
+                img_file, source_hash = self.images[i]
+                start_time = time.perf_counter()
+                index, img_file, page_images, error = process_page_image(
+                    (i, os.path.join(self.image_folder, img_file), source_hash, self.page_task_options(i, options)))
+                if error:
+                    continue
+                seconds.append(time.perf_counter() - start_time)
+                sizes.append(sum(len(page_image['data']) + self.page_overhead_bytes for page_image in page_images))
+            if not sizes:
+                self.estimate_signal.emit("예상: 표본 페이지를 읽지 못했습니다.")
+                return
+
+            size_mb, size_margin = self.extrapolate(sizes, total_pages)
+            size_mb, size_margin = size_mb / 1048576, size_margin / 1048576
+            total_seconds, time_margin = self.extrapolate(seconds, total_pages)
+            total_seconds, time_margin = total_seconds / workers, time_margin / workers  # 작업 프로세스(코어) 수만큼 나눠 처리합니다.
+            total_seconds += budget_seconds
+
+            size_text = f"약 {size_mb:.1f}MB ({max(0, size_mb - size_margin):.1f}~{size_mb + size_margin:.1f}MB)"
+            if self.target_size_mb:
+                if options['class_quality']:
+                    size_text += f", 목표 {self.target_size_mb}MB에 맞춘 품질 " + ", ".join(
+                        f"{PAGE_CLASS_NAMES[page_class]} {quality}" for page_class, quality in options['class_quality'].items())
+                else:
+                    size_text = f"{self.target_size_mb}MB 이하 (목표 용량)"  # 품질을 정하지 못하면 목표 용량을 상한으로 보여 줍니다.
+            self.estimate_signal.emit(f"예상: {size_text}, 시간 {format_duration(total_seconds)}"
+                                      f" (±{format_duration(time_margin)}), 표본 {len(sizes)}/{total_pages}페이지")
+        except Exception as e:
+            logging.error(f"용량 예측 중 오류 발생: {str(e)}")
+            self.estimate_signal.emit("예상: 계산할 수 없습니다.")
+
+    # 표본 값으로 전체 합계와 95% 신뢰 구간의 반폭을 계산합니다. (유한 모집단 보정 포함)
+    @staticmethod
+    def extrapolate(values, total):
+        count = len(values)
+        mean = sum(values) / count
+        if count < 2 or count >= total:
+            return mean * total, 0.0
+        std = math.sqrt(sum((value - mean) ** 2 for value in values) / (count - 1))
+        margin = 1.96 * total * std / math.sqrt(count) * math.sqrt((total - count) / (total - 1))
+        return mean * total, margin
+
+
+# 초 단위 시간을 "3분 20초" 형식으로 바꿉니다.
+def format_duration(seconds):
+    minutes, seconds = divmod(int(round(seconds)), 60)
+    return f"{minutes}분 {seconds}초" if minutes else f"{seconds}초"
+
+
+# 모든 페이지를 축소해서 읽고 책 내용이 들어 있는 크롭 영역을 찾는 스레드
+class AutoCropThread(QThread):
+    message_signal = pyqtSignal(str, str)  # 메시지를 전달하기 위한 시그널
+    progress_label_signal = pyqtSignal(str)  # 라벨 업데이트를 위한 시그널
+    result_signal = pyqtSignal(list)  # 찾은 크롭 영역 [left, top, right, bottom] (찾지 못하면 빈 목록)
+
+    thumbnail_side = 256  # 썸네일의 긴 변 길이(픽셀)
+    padding = 1  # 찾은 영역 바깥으로 더 남길 여백(썸네일 픽셀)
+
+    # image_size: 원본 캡처 크기 (너비, 높이)
+    def __init__(self, parent=None, image_folder=None, images=None, image_size=None, outlier_percent=0, workers=1):
+        super().__init__(parent)
+        self.parent = parent
+        self.image_folder = image_folder
+        self.images = images or []
+        self.image_size = image_size
+        self.outlier_percent = outlier_percent
+        self.workers = workers
+
+    def run(self):
+        try:
+            self.progress_label_signal.emit(f"자동 크롭 영역 찾는 중: {len(self.images)}개 이미지")
+            image_width, image_height = self.image_size
+            scale = self.thumbnail_side / max(image_width, image_height)
+            size = (max(1, round(image_width * scale)), max(1, round(image_height * scale)))
+            tasks = [(os.path.join(self.image_folder, img_file), size) for img_file in self.images]
+            workers = max(1, min(self.workers, len(tasks)))
+            if workers > 1:
+                with ProcessPoolExecutor(max_workers=workers) as executor:
+                    thumbnails = list(executor.map(load_crop_thumbnail, tasks, chunksize=max(1, len(tasks) // (workers * 4))))
+            else:
+                thumbnails = [load_crop_thumbnail(task) for task in tasks]
+
+            thumbnails = [thumbnail for thumbnail in thumbnails if thumbnail is not None]  # 읽지 못한 이미지는 뺍니다.
+            box = find_content_box(np.stack(thumbnails), self.outlier_percent) if thumbnails else None
+            if box is None:
+                self.result_signal.emit([])
+                return
+
+            # 썸네일 좌표를 원본 좌표로 바꾸고 여백을 조금 둡니다.
+            left, top, right, bottom = box
+            scale_x = image_width / size[0]
+            scale_y = image_height / size[1]
+            self.result_signal.emit([max(0, int((left - self.padding) * scale_x)),
+                                     max(0, int((top - self.padding) * scale_y)),
+                                     min(image_width, math.ceil((right + self.padding) * scale_x)),
+                                     min(image_height, math.ceil((bottom + self.padding) * scale_y))])
+
+        except Exception as e:
+            error_msg = f"자동 크롭 영역을 찾는 중 오류가 발생했습니다: {str(e)}\n\n"
+            error_msg += traceback.format_exc()
+            self.message_signal.emit("오류", error_msg)
+            logging.error(error_msg)
+            self.result_signal.emit([])
+
+# 표본 페이지로 JPEG 양자화 테이블을 조정해서 JSON 파일로 저장하는 스레드
+class QTableTuneThread(QThread):
+    message_signal = pyqtSignal(str, str)  # 메시지를 전달하기 위한 시그널
+    progress_label_signal = pyqtSignal(str)  # 라벨 업데이트를 위한 시그널
+    result_signal = pyqtSignal(str)  # 저장한 파일 경로 (실패하면 빈 문자열)
+
+    sample_pages = 8  # 조정에 쓸 표본 페이지 수
+    sample_side = 768  # 표본 페이지 가운데에서 잘라 쓸 정사각형 크기 (줄이지 않아야 글자 크기가 실제와 같습니다.)
+
+    def __init__(self, parent=None, image_folder=None, images=None, crop_box=None, quality=85, subsampling=-1,
+                 output_path=None):
+        super().__init__(parent)
+        self.parent = parent
+        self.image_folder = image_folder
+        self.images = images or []
+        self.crop_box = crop_box
+        self.quality = quality
+        self.subsampling = subsampling
+        self.output_path = output_path
+
+    def run(self):
+        try:
+            self.progress_label_signal.emit("양자화 테이블 조정 중: 표본 페이지 읽는 중")
+            samples = []
+            for i in stratified_sample(len(self.images), self.sample_pages):
+                with open(os.path.join(self.image_folder, self.images[i]), 'rb') as f:
+                    page = load_cropped_page(f.read(), self.crop_box)
+                if page.mode not in ('RGB', 'L'):
+                    page = page.convert('RGB')
+                left = max(0, (page.width - self.sample_side) // 2)
+                top = max(0, (page.height - self.sample_side) // 2)
+                samples.append(page.crop((left, top, min(page.width, left + self.sample_side),
+                                          min(page.height, top + self.sample_side))))
+                page.close()
+
+            tables, tuned_bytes, baseline_bytes = tune_jpeg_qtables(
+                samples, self.quality, self.subsampling,
+                progress=lambda step, steps: self.progress_label_signal.emit(f"양자화 테이블 조정 중: {step}/{steps}"))
+
+            with open(self.output_path, 'w', encoding='utf-8') as f:
+                json.dump({'quality': self.quality, 'subsampling': self.subsampling, 'luma': tables['luma'],
+                           'chroma': tables['chroma'], 'bytes': tuned_bytes, 'baseline_bytes': baseline_bytes}, f, indent=1)
+            self.message_signal.emit("양자화 테이블 조정",
+                                     f"표본 크기: {baseline_bytes / 1024:.0f}KB → {tuned_bytes / 1024:.0f}KB"
+                                     f" ({(1 - tuned_bytes / baseline_bytes) * 100:.1f}% 감소, 같은 SSIM 유지)\n"
+                                     f"저장 위치: {self.output_path}")
+            self.result_signal.emit(self.output_path)
+
+        except Exception as e:
+            error_msg = f"양자화 테이블 조정 중 오류가 발생했습니다: {str(e)}\n\n"
+            error_msg += traceback.format_exc()
+            self.message_signal.emit("오류", error_msg)
+            logging.error(error_msg)
+            self.result_signal.emit("")
+
+# 이미지 목록(매니페스트)을 갱신하는 스레드
+# (처음 여는 폴더는 모든 캡처를 읽어 해시를 구하므로 오래 걸립니다. SQLite 연결은 스레드마다 따로 엽니다.)
+class ManifestRefreshThread(QThread):
+    message_signal = pyqtSignal(str, str)  # 메시지를 전달하기 위한 시그널
+    progress_label_signal = pyqtSignal(str)  # 라벨 업데이트를 위한 시그널
+    result_signal = pyqtSignal(str)  # 갱신을 마친 Image 폴더 경로 (실패하면 빈 문자열)
+
+    def __init__(self, parent=None, image_folder=None, workers=1):
+        super().__init__(parent)
+        self.parent = parent
+        self.image_folder = image_folder
+        self.workers = workers
+
+    def run(self):
+        manifest = None
+        try:
+            self.progress_label_signal.emit("이미지 목록을 읽는 중...")
+            manifest = PageManifest(self.image_folder)
+            manifest.refresh(self.workers)
+            self.result_signal.emit(self.image_folder)
+
+        except Exception as e:
+            error_msg = f"이미지 목록을 읽는 중 오류가 발생했습니다: {str(e)}\n\n"
+            error_msg += traceback.format_exc()
+            self.message_signal.emit("오류", error_msg)
+            logging.error(error_msg)
+            self.result_signal.emit("")
+        finally:
+            if manifest:
+                manifest.close()
+
+# 중복 페이지(넘김 실패로 같은 화면이 찍힌 캡처)를 찾는 스레드
+class DuplicateScanThread(QThread):
+    message_signal = pyqtSignal(str, str)  # 메시지를 전달하기 위한 시그널
+    progress_label_signal = pyqtSignal(str)  # 라벨 업데이트를 위한 시그널
+    result_signal = pyqtSignal(list)  # 중복 페이지 목록 [(파일명, 해밍 거리), ...]
+
+    def __init__(self, parent=None, image_folder=None, images=None, crop_box=None, max_distance=4, workers=1):
+        super().__init__(parent)
+        self.parent = parent
+        self.image_folder = image_folder
+        self.images = images or []
+        self.crop_box = crop_box
+        self.max_distance = max_distance
+        self.workers = workers
+
+    def run(self):
+        try:
+            self.progress_label_signal.emit(f"중복 페이지 검사 중: {len(self.images)}개 이미지")
+            tasks = [(os.path.join(self.image_folder, img_file), self.crop_box) for img_file in self.images]
+            workers = max(1, min(self.workers, len(tasks)))
+            if workers > 1:
+                with ProcessPoolExecutor(max_workers=workers) as executor:
+                    thumbnails = list(executor.map(load_hash_thumbnail, tasks, chunksize=max(1, len(tasks) // (workers * 4))))
+            else:
+                thumbnails = [load_hash_thumbnail(task) for task in tasks]
+
+            # 읽지 못한 이미지는 검사에서 뺍니다.
+            valid = [i for i, thumbnail in enumerate(thumbnails) if thumbnail is not None]
+            hashes = perceptual_hashes(np.stack([thumbnails[i] for i in valid])) if valid else np.zeros((0, 64), bool)
+            duplicates = find_duplicate_pages(hashes, self.max_distance)
+            self.result_signal.emit([(self.images[valid[index]], distance) for index, distance in duplicates])
+
+        except Exception as e:
+            error_msg = f"중복 페이지 검사 중 오류가 발생했습니다: {str(e)}\n\n"
+            error_msg += traceback.format_exc()
+            self.message_signal.emit("오류", error_msg)
+            logging.error(error_msg)
+            self.result_signal.emit([])
+
 # 이미지 위젯 클래스를 정의합니다.
 class ImageWidget(QWidget):
     def __init__(self, parent=None):
@@ -207,6 +2131,14 @@ class IntegratedEBookApp(QMainWindow):
     def __init__(self):
         super().__init__()  # 부모 클래스의 __init__ 메서드를 호출합니다.
         self.macro_thread = None  # 매크로 스레드 인스턴스 초기화
+        self.pdf_thread = None  # PDF 생성 스레드 인스턴스 초기화
+        self.duplicate_thread = None  # 중복 페이지 검사 스레드 인스턴스 초기화
+        self.auto_crop_thread = None  # 자동 크롭 영역 찾기 스레드 인스턴스 초기화
+        self.manifest_thread = None  # 이미지 목록 갱신 스레드 인스턴스 초기화
+        self.qtable_thread = None  # 양자화 테이블 조정 스레드 인스턴스 초기화
+        self.estimate_thread = None  # 용량/시간 예측 스레드 인스턴스 초기화
+        self.estimate_pending = False  # 예측 중에 설정이 바뀌었으면 끝난 뒤 다시 예측합니다.
+        self.manifest = None  # Image 폴더의 이미지 목록(매니페스트), PDF 탭을 초기화할 때 엽니다.
         self.setWindowTitle("eBook 캡처 및 PDF 생성기 by muttul Ver37(2025.0104.1714)")  # 윈도우 제목을 설정합니다.
         self.setGeometry(100, 100, 1000, 1000)  # 윈도우 크기와 위치를 설정합니다. (x, y, width, height)
 
@@ -662,6 +2594,30 @@ class IntegratedEBookApp(QMainWindow):
             layout.addWidget(spin)  # 스핀 박스를 레이아웃에 추가합니다.
             crop_layout.addLayout(layout)  # 생성한 레이아웃을 크롭 설정 레이아웃에 추가합니다.
 
+        # 자동 크롭 (모든 페이지를 비교해 뷰어 화면과 여백을 뺀 내용 영역을 찾아 위 좌표에 넣습니다.)
+        auto_crop_layout = QHBoxLayout()  # 자동 크롭 설정을 위한 수평 박스 레이아웃을 생성합니다.
+        auto_crop_layout.addWidget(QLabel("제외할 바깥 페이지(%):", self))  # 레이블을 생성하고 레이아웃에 추가합니다.
+        self.auto_crop_outlier_spin = QSpinBox(self)  # 영역 계산에서 뺄 페이지 비율을 입력받을 스핀 박스를 생성합니다.
+        self.auto_crop_outlier_spin.setRange(0, 20)  # 0(모든 페이지의 합집합)부터 20%까지 설정할 수 있습니다.
+        self.auto_crop_outlier_spin.setValue(0)  # 기본값은 모든 페이지가 잘리지 않는 합집합입니다.
+        auto_crop_layout.addWidget(self.auto_crop_outlier_spin)  # 스핀 박스를 레이아웃에 추가합니다.
+        self.auto_crop_button = QPushButton("자동 크롭", self)  # "자동 크롭" 버튼을 생성합니다.
+        self.auto_crop_button.clicked.connect(self.find_auto_crop)  # 버튼 클릭 시 find_auto_crop 메서드를 호출합니다.
+        auto_crop_layout.addWidget(self.auto_crop_button)  # 버튼을 레이아웃에 추가합니다.
+        crop_layout.addLayout(auto_crop_layout)  # 자동 크롭 레이아웃을 크롭 설정 레이아웃에 추가합니다.
+
+        # 페이지별 크롭 옵션 (홀수/짝수 쪽처럼 본문 위치가 바뀌는 책은 크롭 영역 안에서 페이지마다 내용에 맞춰 자릅니다.)
+        self.adaptive_crop_checkbox = QCheckBox("크롭 영역 안에서 페이지마다 내용 위치에 맞춰 자르기", self)  # 체크박스를 생성합니다.
+        crop_layout.addWidget(self.adaptive_crop_checkbox)  # 체크박스를 크롭 설정 레이아웃에 추가합니다.
+
+        # 펼침 화면 나누기 옵션 (두 쪽이 나란히 찍힌 캡처를 가운데 접힌 부분에서 왼쪽, 오른쪽 페이지로 나눕니다.)
+        self.split_spreads_checkbox = QCheckBox("두 쪽 펼침 화면을 왼쪽/오른쪽 페이지로 나누기", self)  # 체크박스를 생성합니다.
+        crop_layout.addWidget(self.split_spreads_checkbox)  # 체크박스를 크롭 설정 레이아웃에 추가합니다.
+
+        # 기울기 보정 옵션 (조금 기울어져 찍힌 페이지를 바로 세워 여백과 용량을 줄입니다.)
+        self.deskew_checkbox = QCheckBox("기울어진 페이지 바로 세우기", self)  # 체크박스를 생성합니다.
+        crop_layout.addWidget(self.deskew_checkbox)  # 체크박스를 크롭 설정 레이아웃에 추가합니다.
+
         crop_group.setLayout(crop_layout)  # 크롭 설정 그룹에 레이아웃을 설정합니다.
         left_layout.addWidget(crop_group)  # 크롭 설정 그룹을 왼쪽 레이아웃에 추가합니다.
 
@@ -697,6 +2653,33 @@ class IntegratedEBookApp(QMainWindow):
         # 전체 레이아웃에 그룹 박스 추가
         left_layout.addWidget(orientation_group_box)
 
+        left_layout.addSpacing(10)  # 그룹 박스 사이에 10픽셀의 간격을 추가합니다.
+
+        # 중복 페이지 검사 그룹 (체크된 페이지는 PDF에서 제외됩니다. 체크를 풀면 다시 포함됩니다.)
+        duplicate_group = QGroupBox("중복 페이지")  # "중복 페이지"라는 제목의 그룹 박스를 생성합니다.
+        duplicate_layout = QVBoxLayout()  # 중복 페이지 그룹의 레이아웃을 수직 박스 레이아웃으로 설정합니다.
+
+        distance_layout = QHBoxLayout()  # 판정 거리 설정을 위한 수평 박스 레이아웃을 생성합니다.
+        distance_layout.addWidget(QLabel("판정 거리(0~64, 작을수록 엄격):"))  # 레이블을 생성하고 레이아웃에 추가합니다.
+        self.duplicate_distance_spin = QSpinBox(self)  # 해밍 거리를 입력받을 스핀 박스를 생성합니다.
+        self.duplicate_distance_spin.setRange(0, 64)  # 64비트 해시이므로 0부터 64까지입니다.
+        self.duplicate_distance_spin.setValue(4)  # 기본값은 4비트입니다.
+        distance_layout.addWidget(self.duplicate_distance_spin)  # 스핀 박스를 레이아웃에 추가합니다.
+        duplicate_layout.addLayout(distance_layout)  # 판정 거리 레이아웃을 그룹 레이아웃에 추가합니다.
+
+        self.find_duplicates_button = QPushButton("중복 페이지 검사", self)  # "중복 페이지 검사" 버튼을 생성합니다.
+        self.find_duplicates_button.clicked.connect(self.scan_duplicate_pages)  # 버튼 클릭 시 scan_duplicate_pages 메서드를 호출합니다.
+        self.find_duplicates_button.setStyleSheet(button_style)  # 버튼의 스타일을 설정합니다.
+        duplicate_layout.addWidget(self.find_duplicates_button)  # 버튼을 레이아웃에 추가합니다.
+
+        self.duplicate_list = QListWidget(self)  # 중복 페이지 목록을 표시할 리스트 위젯을 생성합니다.
+        self.duplicate_list.setFixedHeight(80)  # 리스트 위젯의 높이를 80픽셀로 고정합니다.
+        self.duplicate_list.itemClicked.connect(self.show_duplicate_page)  # 항목 클릭 시 해당 이미지를 미리보기에 표시합니다.
+        duplicate_layout.addWidget(self.duplicate_list)  # 리스트 위젯을 레이아웃에 추가합니다.
+
+        duplicate_group.setLayout(duplicate_layout)  # 중복 페이지 그룹에 레이아웃을 설정합니다.
+        left_layout.addWidget(duplicate_group)  # 중복 페이지 그룹을 왼쪽 레이아웃에 추가합니다.
+
         # 레이아웃을 위젯에 설정
         self.setLayout(left_layout)
 
@@ -713,10 +2696,159 @@ class IntegratedEBookApp(QMainWindow):
         compression_layout.addWidget(self.compression_slider)  # 슬라이더를 레이아웃에 추가합니다.
         self.compression_value_label = QLabel("85")  # 압축 수준 값을 표시할 레이블을 생성합니다.
         compression_layout.addWidget(self.compression_value_label)  # 레이블을 레이아웃에 추가합니다.
+        self.estimate_label = QLabel("")  # 예상 용량과 생성 시간을 표시할 레이블을 생성합니다.
+        compression_layout.addWidget(self.estimate_label)  # 레이블을 레이아웃에 추가합니다.
         left_layout.addLayout(compression_layout)  # 압축 설정 레이아웃을 왼쪽 레이아웃에 추가합니다.
 
+        # 설정을 바꿀 때마다 바로 계산하지 않고, 마지막 변경 후 잠시 기다렸다가 한 번만 예측합니다.
+        self.estimate_timer = QTimer(self)
+        self.estimate_timer.setSingleShot(True)
+        self.estimate_timer.setInterval(800)
+        self.estimate_timer.timeout.connect(self.start_estimate)
+
         self.compression_slider.valueChanged.connect(self.update_compression_label)  # 슬라이더 값 변경 시 update_compression_label 메서드를 호출합니다.
 
+        # 목표 해상도 설정 (용지에 표시되는 크기보다 큰 캡처는 이 해상도에 맞게 줄여서 넣습니다.)
+        dpi_layout = QHBoxLayout()  # 목표 해상도 설정을 위한 수평 박스 레이아웃을 생성합니다.
+        dpi_layout.addWidget(QLabel("목표 해상도(DPI, 0=원본):"))  # 레이블을 생성하고 레이아웃에 추가합니다.
+        self.target_dpi_spin = QSpinBox(self)  # 목표 해상도를 입력받을 스핀 박스를 생성합니다.
+        self.target_dpi_spin.setRange(0, 1200)  # 0부터 1200 DPI까지 설정할 수 있습니다.
+        self.target_dpi_spin.setSingleStep(50)  # 50 DPI 단위로 변경합니다.
+        self.target_dpi_spin.setValue(0)  # 기본값은 원본 크기입니다.
+        dpi_layout.addWidget(self.target_dpi_spin)  # 스핀 박스를 레이아웃에 추가합니다.
+        left_layout.addLayout(dpi_layout)  # 목표 해상도 레이아웃을 왼쪽 레이아웃에 추가합니다.
+
+        # 목표 화질(SSIM) 모드 (압축 수준 대신 페이지마다 목표 SSIM을 만족하는 가장 낮은 JPEG 품질을 씁니다.)
+        ssim_layout = QHBoxLayout()  # 목표 화질 설정을 위한 수평 박스 레이아웃을 생성합니다.
+        self.ssim_target_checkbox = QCheckBox("목표 화질 모드, 최소 SSIM:", self)  # 체크박스를 생성합니다.
+        ssim_layout.addWidget(self.ssim_target_checkbox)  # 체크박스를 레이아웃에 추가합니다.
+        self.min_ssim_spin = QDoubleSpinBox(self)  # 목표 SSIM을 입력받을 스핀 박스를 생성합니다.
+        self.min_ssim_spin.setRange(0.8, 0.999)  # 0.8부터 0.999까지 설정할 수 있습니다.
+        self.min_ssim_spin.setDecimals(3)  # 소수점 셋째 자리까지 표시합니다.
+        self.min_ssim_spin.setSingleStep(0.005)  # 0.005 단위로 변경합니다.
+        self.min_ssim_spin.setValue(0.95)  # 기본값은 0.95입니다.
+        ssim_layout.addWidget(self.min_ssim_spin)  # 스핀 박스를 레이아웃에 추가합니다.
+        left_layout.addLayout(ssim_layout)  # 목표 화질 레이아웃을 왼쪽 레이아웃에 추가합니다.
+
+        # 목표 용량 설정 (표본 페이지로 크기를 예측해 한 번에 목표 용량 아래로 맞춥니다. 압축 수준과 목표 화질보다 우선합니다.)
+        target_size_layout = QHBoxLayout()  # 목표 용량 설정을 위한 수평 박스 레이아웃을 생성합니다.
+        target_size_layout.addWidget(QLabel("목표 용량(MB, 0=사용 안 함):"))  # 레이블을 생성하고 레이아웃에 추가합니다.
+        self.target_size_spin = QSpinBox(self)  # 목표 용량을 입력받을 스핀 박스를 생성합니다.
+        self.target_size_spin.setRange(0, 10000)  # 0부터 10000MB까지 설정할 수 있습니다.
+        self.target_size_spin.setValue(0)  # 기본값은 사용하지 않음입니다.
+        target_size_layout.addWidget(self.target_size_spin)  # 스핀 박스를 레이아웃에 추가합니다.
+        left_layout.addLayout(target_size_layout)  # 목표 용량 레이아웃을 왼쪽 레이아웃에 추가합니다.
+
+        # 글자 페이지 흑백 압축 옵션 (글자만 있는 페이지는 1비트 흑백 CCITT G4로 넣어 크기를 크게 줄입니다.)
+        self.bilevel_text_checkbox = QCheckBox("글자만 있는 페이지는 흑백(CCITT G4)으로 압축", self)  # 체크박스를 생성합니다.
+        if not features.check('libtiff'):
+            self.bilevel_text_checkbox.setEnabled(False)  # Pillow에 libtiff가 없으면 사용할 수 없습니다.
+            self.bilevel_text_checkbox.setToolTip("libtiff가 포함된 Pillow가 필요합니다.")
+        left_layout.addWidget(self.bilevel_text_checkbox)  # 체크박스를 왼쪽 레이아웃에 추가합니다.
+
+        # 회색조 자동 판단 옵션 (색이 거의 없는 페이지는 한 채널로 저장해 크기와 시간을 줄입니다.)
+        self.grayscale_checkbox = QCheckBox("색이 거의 없는 페이지는 회색조로 저장", self)  # 체크박스를 생성합니다.
+        left_layout.addWidget(self.grayscale_checkbox)  # 체크박스를 왼쪽 레이아웃에 추가합니다.
+
+        # 배경 정리 옵션 (종이 질감과 잡티를 순백으로 바꿔 압축 크기와 시간을 줄입니다. 어두운 테마는 검정으로 바꿉니다.)
+        self.flatten_background_checkbox = QCheckBox("배경 질감/잡티를 순백(어두운 테마는 검정)으로 정리", self)  # 체크박스를 생성합니다.
+        left_layout.addWidget(self.flatten_background_checkbox)  # 체크박스를 왼쪽 레이아웃에 추가합니다.
+
+        # MRC 압축 옵션 (글자와 그림이 섞인 페이지를 글자 모양, 글자색, 배경 층으로 나눠 글자는 선명하게, 배경은 작게 넣습니다.)
+        self.mrc_checkbox = QCheckBox("글자와 그림이 섞인 페이지는 층을 나눠 압축 (MRC)", self)  # 체크박스를 생성합니다.
+        left_layout.addWidget(self.mrc_checkbox)  # 체크박스를 왼쪽 레이아웃에 추가합니다.
+
+        # JPEG 2000 옵션 (그림이 많은 책은 같은 화질에서 JPEG보다 작게 넣을 수 있습니다.)
+        jpx_layout = QHBoxLayout()  # JPEG 2000 설정을 위한 수평 박스 레이아웃을 생성합니다.
+        self.jpx_checkbox = QCheckBox("JPEG 2000으로 압축, 압축률(1/N):", self)  # 체크박스를 생성합니다.
+        jpx_layout.addWidget(self.jpx_checkbox)  # 체크박스를 레이아웃에 추가합니다.
+        self.jpx_rate_spin = QSpinBox(self)  # 압축률을 입력받을 스핀 박스를 생성합니다.
+        self.jpx_rate_spin.setRange(2, 200)  # 1/2부터 1/200까지 설정할 수 있습니다.
+        self.jpx_rate_spin.setValue(20)  # 기본값은 1/20입니다.
+        jpx_layout.addWidget(self.jpx_rate_spin)  # 스핀 박스를 레이아웃에 추가합니다.
+        if not features.check('jpg_2000'):
+            self.jpx_checkbox.setEnabled(False)  # Pillow에 OpenJPEG가 없으면 사용할 수 없습니다.
+            self.jpx_checkbox.setToolTip("OpenJPEG가 포함된 Pillow가 필요합니다.")
+        self.jpx_checkbox.toggled.connect(self.on_jpx_toggled)  # JPEG 품질로 정하는 설정을 켜고 끕니다.
+        left_layout.addLayout(jpx_layout)  # JPEG 2000 레이아웃을 왼쪽 레이아웃에 추가합니다.
+
+        # JPEG 양자화 테이블 설정 (화면 캡처 글자에 맞춘 테이블을 쓰거나, 표본 페이지로 조정한 테이블을 씁니다.)
+        qtable_layout = QHBoxLayout()  # 양자화 테이블 설정을 위한 수평 박스 레이아웃을 생성합니다.
+        qtable_layout.addWidget(QLabel("양자화 테이블:"))  # 레이블을 생성하고 레이아웃에 추가합니다.
+        self.qtable_combo = QComboBox(self)  # 테이블을 고를 콤보 박스를 생성합니다.
+        self.qtable_combo.addItem("기본 (libjpeg)", 'libjpeg')
+        self.qtable_combo.addItem("글자용", 'text')
+        self.qtable_combo.addItem("평탄", 'flat')
+        self.qtable_combo.addItem("조정값 (jpeg_qtables.json)", 'tuned')
+        qtable_layout.addWidget(self.qtable_combo)  # 콤보 박스를 레이아웃에 추가합니다.
+        self.tune_qtable_button = QPushButton("표본으로 조정", self)  # "표본으로 조정" 버튼을 생성합니다.
+        self.tune_qtable_button.clicked.connect(self.start_qtable_tuning)  # 버튼 클릭 시 start_qtable_tuning 메서드를 호출합니다.
+        qtable_layout.addWidget(self.tune_qtable_button)  # 버튼을 레이아웃에 추가합니다.
+        left_layout.addLayout(qtable_layout)  # 양자화 테이블 레이아웃을 왼쪽 레이아웃에 추가합니다.
+
+        # JPEG 색 샘플링 설정 (4:4:4는 색 글자의 번짐이 없고, 4:2:0은 크기가 작습니다.)
+        subsampling_layout = QHBoxLayout()  # 색 샘플링 설정을 위한 수평 박스 레이아웃을 생성합니다.
+        subsampling_layout.addWidget(QLabel("색 샘플링:"))  # 레이블을 생성하고 레이아웃에 추가합니다.
+        self.subsampling_combo = QComboBox(self)  # 색 샘플링을 고를 콤보 박스를 생성합니다.
+        self.subsampling_combo.addItem("기본", -1)
+        self.subsampling_combo.addItem("4:4:4 (색 글자 선명)", 0)
+        self.subsampling_combo.addItem("4:2:0 (작은 크기)", 2)
+        subsampling_layout.addWidget(self.subsampling_combo)  # 콤보 박스를 레이아웃에 추가합니다.
+        left_layout.addLayout(subsampling_layout)  # 색 샘플링 레이아웃을 왼쪽 레이아웃에 추가합니다.
+
+        # 압축 방식 자동 선택 옵션 (JPEG, Flate, 팔레트, G4 중 화질 기준을 만족하는 가장 작은 방식을 고릅니다.)
+        auto_encoder_layout = QHBoxLayout()  # 자동 선택 설정을 위한 수평 박스 레이아웃을 생성합니다.
+        self.auto_encoder_checkbox = QCheckBox("압축 방식 자동 선택, 최소 PSNR(dB):", self)  # 체크박스를 생성합니다.
+        auto_encoder_layout.addWidget(self.auto_encoder_checkbox)  # 체크박스를 레이아웃에 추가합니다.
+        self.min_psnr_spin = QSpinBox(self)  # 최소 화질(PSNR)을 입력받을 스핀 박스를 생성합니다.
+        self.min_psnr_spin.setRange(20, 60)  # 20dB부터 60dB까지 설정할 수 있습니다.
+        self.min_psnr_spin.setValue(35)  # 기본값은 35dB입니다.
+        auto_encoder_layout.addWidget(self.min_psnr_spin)  # 스핀 박스를 레이아웃에 추가합니다.
+        left_layout.addLayout(auto_encoder_layout)  # 자동 선택 레이아웃을 왼쪽 레이아웃에 추가합니다.
+
+        # 작업 프로세스 수 설정 (페이지 처리를 여러 CPU 코어로 나눕니다.)
+        workers_layout = QHBoxLayout()  # 작업 프로세스 수 설정을 위한 수평 박스 레이아웃을 생성합니다.
+        workers_layout.addWidget(QLabel("작업 프로세스 수:"))  # "작업 프로세스 수:" 레이블을 생성하고 레이아웃에 추가합니다.
+        self.workers_spin = QSpinBox(self)  # 작업 프로세스 수를 입력받을 스핀 박스를 생성합니다.
+        self.workers_spin.setRange(1, os.cpu_count() or 1)  # 1부터 CPU 코어 수까지 선택할 수 있습니다.
+        self.workers_spin.setValue(os.cpu_count() or 1)  # 기본값은 CPU 코어 수입니다.
+        workers_layout.addWidget(self.workers_spin)  # 스핀 박스를 레이아웃에 추가합니다.
+        left_layout.addLayout(workers_layout)  # 작업 프로세스 수 레이아웃을 왼쪽 레이아웃에 추가합니다.
+
+        # 메모리 상한 설정 (페이지가 아주 많은 책을 만들 때 메모리 사용량을 제한합니다.)
+        memory_layout = QHBoxLayout()  # 메모리 상한 설정을 위한 수평 박스 레이아웃을 생성합니다.
+        memory_layout.addWidget(QLabel("메모리 상한(MB, 0=제한 없음):"))  # 레이블을 생성하고 레이아웃에 추가합니다.
+        self.memory_limit_spin = QSpinBox(self)  # 메모리 상한을 입력받을 스핀 박스를 생성합니다.
+        self.memory_limit_spin.setRange(0, 65536)  # 0부터 64GB까지 설정할 수 있습니다.
+        self.memory_limit_spin.setSingleStep(256)  # 256MB 단위로 변경합니다.
+        self.memory_limit_spin.setValue(0)  # 기본값은 제한 없음입니다.
+        if psutil is None:
+            self.memory_limit_spin.setEnabled(False)  # psutil이 없으면 메모리 사용량을 알 수 없으므로 끕니다.
+            self.memory_limit_spin.setToolTip("psutil 모듈을 설치하면 사용할 수 있습니다.")
+        memory_layout.addWidget(self.memory_limit_spin)  # 스핀 박스를 레이아웃에 추가합니다.
+        left_layout.addLayout(memory_layout)  # 메모리 상한 레이아웃을 왼쪽 레이아웃에 추가합니다.
+
+        # 페이지 캐시 크기 설정 (크롭/압축 수준을 조금 바꿔 다시 만들 때 바뀌지 않은 페이지를 재사용합니다.)
+        cache_layout = QHBoxLayout()  # 페이지 캐시 설정을 위한 수평 박스 레이아웃을 생성합니다.
+        cache_layout.addWidget(QLabel("페이지 캐시(MB, 0=사용 안 함):"))  # 레이블을 생성하고 레이아웃에 추가합니다.
+        self.cache_size_spin = QSpinBox(self)  # 캐시 크기를 입력받을 스핀 박스를 생성합니다.
+        self.cache_size_spin.setRange(0, 65536)  # 0부터 64GB까지 설정할 수 있습니다.
+        self.cache_size_spin.setSingleStep(256)  # 256MB 단위로 변경합니다.
+        self.cache_size_spin.setValue(1024)  # 기본값은 1GB입니다.
+        cache_layout.addWidget(self.cache_size_spin)  # 스핀 박스를 레이아웃에 추가합니다.
+        left_layout.addLayout(cache_layout)  # 페이지 캐시 레이아웃을 왼쪽 레이아웃에 추가합니다.
+
+        # JPEG 무손실 자르기 옵션 (JPEG 캡처 파일은 다시 압축하지 않고 jpegtran으로 잘라서 넣습니다.)
+        self.jpegtran_path = shutil.which("jpegtran")  # jpegtran 실행 파일 경로 (PATH에서 찾습니다.)
+        self.lossless_jpeg_checkbox = QCheckBox("JPEG 원본은 무손실로 자르기 (jpegtran)", self)  # 체크박스를 생성합니다.
+        if not self.jpegtran_path:
+            self.lossless_jpeg_checkbox.setEnabled(False)  # jpegtran이 없으면 사용할 수 없습니다.
+            self.lossless_jpeg_checkbox.setToolTip("jpegtran(libjpeg-turbo)을 설치하고 PATH에 추가하면 사용할 수 있습니다.")
+        else:
+            self.lossless_jpeg_checkbox.setToolTip("자르는 영역의 왼쪽/위쪽이 8 또는 16픽셀 단위로 맞춰집니다. 압축 수준은 적용되지 않습니다.\n"
+                                                   "기울기 보정, 배경 정리, 압축 방식 설정 등을 켜면 다시 인코딩하므로 사용되지 않습니다.")
+        left_layout.addWidget(self.lossless_jpeg_checkbox)  # 체크박스를 왼쪽 레이아웃에 추가합니다.
+
         left_layout.addSpacing(10)  # 그룹 박스 사이에 10픽셀의 간격을 추가합니다.
 
         left_layout.addSpacing(10)  # 그룹 박스 사이에 10픽셀의 간격을 추가합니다.
@@ -727,12 +2859,23 @@ class IntegratedEBookApp(QMainWindow):
         self.create_pdf_button.setStyleSheet(button_style)  # 버튼의 스타일을 설정합니다.
         left_layout.addWidget(self.create_pdf_button)  # 버튼을 왼쪽 레이아웃에 추가합니다.
 
+        # PDF 생성 중지 버튼
+        self.stop_pdf_button = QPushButton("PDF 생성 중지", self)  # "PDF 생성 중지" 버튼을 생성합니다.
+        self.stop_pdf_button.clicked.connect(self.stop_pdf)  # 버튼 클릭 시 stop_pdf 메서드를 호출합니다.
+        self.stop_pdf_button.setStyleSheet(button_style.replace("#4CAF50", "#ff0000").replace("#45a049", "#8B0000"))  # 중지 버튼은 빨간색으로 설정합니다.
+        self.stop_pdf_button.setEnabled(False)  # PDF 생성 중일 때만 활성화합니다.
+        left_layout.addWidget(self.stop_pdf_button)  # 버튼을 왼쪽 레이아웃에 추가합니다.
+
         left_layout.addSpacing(10)  # 그룹 박스 사이에 10픽셀의 간격을 추가합니다.
 
         # PDF 자동 열기 옵션
         self.auto_open_checkbox = QCheckBox("PDF 생성 후 자동으로 열기", self)  # "PDF 생성 후 자동으로 열기" 체크박스를 생성합니다.
         left_layout.addWidget(self.auto_open_checkbox)  # 체크박스를 왼쪽 레이아웃에 추가합니다.
 
+        # 잘라낸 이미지(PNG) 저장 옵션 (기본은 저장하지 않고 PDF만 만듭니다.)
+        self.save_cropped_checkbox = QCheckBox("잘라낸 이미지(PNG)도 cropped_images 폴더에 저장", self)  # 체크박스를 생성합니다.
+        left_layout.addWidget(self.save_cropped_checkbox)  # 체크박스를 왼쪽 레이아웃에 추가합니다.
+
         left_layout.addSpacing(100)  # 그룹 박스 사이에 100픽셀의 간격을 추가합니다.
 
         # 상단 위젯들을 left_main_layout에 추가
@@ -751,10 +2894,29 @@ class IntegratedEBookApp(QMainWindow):
         self.progress_label.setVisible(False)  # 초기에는 레이블을 숨깁니다.
         self.progress_label.setAlignment(Qt.AlignCenter)  # 레이블의 텍스트를 중앙 정렬합니다.
         progress_layout.addWidget(self.progress_label)  # 레이블을 레이아웃에 추가합니다.
+
+        self.error_list = QListWidget(self)  # 오류가 난 페이지를 표시할 리스트 위젯을 생성합니다.
+        self.error_list.setFixedHeight(80)  # 리스트 위젯의 높이를 80픽셀로 고정합니다.
+        self.error_list.setVisible(False)  # 오류가 있을 때만 표시합니다.
+        progress_layout.addWidget(self.error_list)  # 리스트 위젯을 레이아웃에 추가합니다.
         
         progress_group.setLayout(progress_layout)  # 진행 상황 그룹에 레이아웃을 설정합니다.
         left_main_layout.addWidget(progress_group)  # 진행 상황 그룹을 왼쪽 메인 레이아웃에 추가합니다.
 
+        # 크롭 영역, 방향, 압축 설정이 바뀌면 예상 용량과 생성 시간을 다시 계산합니다.
+        for spin in [self.left_spin, self.top_spin, self.right_spin, self.bottom_spin, self.compression_slider,
+                     self.target_dpi_spin, self.min_psnr_spin, self.min_ssim_spin, self.target_size_spin, self.workers_spin,
+                     self.jpx_rate_spin]:
+            spin.valueChanged.connect(self.schedule_estimate)
+        for checkbox in [self.portrait_radio, self.landscape_radio, self.bilevel_text_checkbox, self.grayscale_checkbox,
+                         self.auto_encoder_checkbox, self.ssim_target_checkbox, self.lossless_jpeg_checkbox,
+                         self.adaptive_crop_checkbox, self.split_spreads_checkbox, self.deskew_checkbox,
+                         self.flatten_background_checkbox, self.mrc_checkbox, self.jpx_checkbox]:
+            checkbox.toggled.connect(self.schedule_estimate)
+        self.duplicate_list.itemChanged.connect(self.schedule_estimate)  # 제외할 중복 페이지가 바뀐 경우
+        for combo in [self.qtable_combo, self.subsampling_combo]:
+            combo.currentIndexChanged.connect(self.schedule_estimate)
+
         # 왼쪽 메뉴의 고정 너비 설정
         left_widget.setFixedWidth(380)  # 왼쪽 위젯의 너비를 380픽셀로 고정합니다.
 
@@ -798,9 +2960,242 @@ class IntegratedEBookApp(QMainWindow):
         QMessageBox.information(self, "완료", "매크로 실행이 완료되었습니다.")  # 매크로 실행 완료 알림
 
 
+    def scan_duplicate_pages(self):
+        if self.duplicate_thread and self.duplicate_thread.isRunning():
+            return
+        if not self.manifest:
+            QMessageBox.warning(self, "경고", "먼저 폴더를 선택해주세요.")
+            return
+        if self.manifest_refreshing():
+            return
+        self.manifest.refresh(self.workers_spin.value())  # 바뀐 파일만 다시 읽습니다.
+        images = self.manifest.names()
+        if not images:
+            QMessageBox.warning(self, "경고", "선택한 폴더에 이미지 파일이 없습니다.")
+            return
+
+        # 크롭 영역이 있으면 그 안쪽만 비교합니다. (시계 등 뷰어 화면 요소의 영향을 줄입니다.)
+        crop_box = None
+        if hasattr(self, 'crop_rect') and not self.crop_rect.isNull():
+            crop_box = (self.crop_rect.left(), self.crop_rect.top(), self.crop_rect.right(), self.crop_rect.bottom())
+
+        self.duplicate_thread = DuplicateScanThread(
+            parent=self,
+            image_folder=self.image_folder,
+            images=images,
+            crop_box=crop_box,
+            max_distance=self.duplicate_distance_spin.value(),
+            workers=self.workers_spin.value()
+        )
+        self.duplicate_thread.message_signal.connect(lambda title, msg: QMessageBox.information(self, title, msg))
+        self.duplicate_thread.progress_label_signal.connect(self.progress_label.setText)
+        self.duplicate_thread.result_signal.connect(self.on_duplicates_found)
+
+        self.find_duplicates_button.setEnabled(False)
+        self.progress_label.setVisible(True)
+        self.duplicate_thread.start()
+
+    def find_auto_crop(self):
+        if self.auto_crop_thread and self.auto_crop_thread.isRunning():
+            return
+        if not self.manifest:
+            QMessageBox.warning(self, "경고", "먼저 폴더를 선택해주세요.")
+            return
+        if self.manifest_refreshing():
+            return
+        self.manifest.refresh(self.workers_spin.value())  # 바뀐 파일만 다시 읽습니다.
+        pages = self.manifest.pages()
+        if not pages:
+            QMessageBox.warning(self, "경고", "선택한 폴더에 이미지 파일이 없습니다.")
+            return
+
+        # 가장 많은 캡처의 크기를 기준으로 합니다.
+        sizes = {}
+        for name, width, height, mode, image_format, size, sha1 in pages:
+            sizes[(width, height)] = sizes.get((width, height), 0) + 1
+        image_size = max(sizes, key=sizes.get)
+
+        self.auto_crop_thread = AutoCropThread(
+            parent=self,
+            image_folder=self.image_folder,
+            images=[page[0] for page in pages],
+            image_size=image_size,
+            outlier_percent=self.auto_crop_outlier_spin.value(),
+            workers=self.workers_spin.value()
+        )
+        self.auto_crop_thread.message_signal.connect(lambda title, msg: QMessageBox.information(self, title, msg))
+        self.auto_crop_thread.progress_label_signal.connect(self.progress_label.setText)
+        self.auto_crop_thread.result_signal.connect(self.on_auto_crop_found)
+
+        self.auto_crop_button.setEnabled(False)
+        self.progress_label.setVisible(True)
+        self.auto_crop_thread.start()
+
+    def on_auto_crop_found(self, box):
+        self.auto_crop_button.setEnabled(True)
+        self.progress_label.setVisible(False)
+        if not box:
+            QMessageBox.warning(self, "자동 크롭", "내용 영역을 찾지 못했습니다. 크롭 영역을 직접 선택해주세요.")
+            return
+        left, top, right, bottom = box
+        # 스핀 박스 값이 바뀌면 update_crop_from_spinbox가 크롭 영역과 미리보기를 갱신합니다.
+        self.left_spin.setValue(left)
+        self.top_spin.setValue(top)
+        self.right_spin.setValue(right)
+        self.bottom_spin.setValue(bottom)
+
+    def on_duplicates_found(self, duplicates):
+        self.find_duplicates_button.setEnabled(True)
+        self.progress_label.setVisible(False)
+        self.duplicate_list.clear()
+        for img_file, distance in duplicates:
+            item = QListWidgetItem(f"{img_file} (거리 {distance})")
+            item.setData(Qt.UserRole, img_file)  # 실제 파일명을 저장합니다.
+            item.setFlags(item.flags() | Qt.ItemIsUserCheckable)
+            item.setCheckState(Qt.Checked)  # 기본으로 제외합니다. 체크를 풀면 PDF에 다시 포함됩니다.
+            self.duplicate_list.addItem(item)
+        QMessageBox.information(self, "중복 페이지 검사", f"중복 페이지 {len(duplicates)}개를 찾았습니다.\n체크된 페이지는 PDF 생성 시 제외됩니다.")
+
+    def get_excluded_images(self):
+        excluded = set()
+        for row in range(self.duplicate_list.count()):
+            item = self.duplicate_list.item(row)
+            if item.checkState() == Qt.Checked:
+                excluded.add(item.data(Qt.UserRole))
+        return excluded
+
+    def show_duplicate_page(self, item):
+        # 선택한 중복 페이지를 미리보기에 표시합니다.
+        img_file = item.data(Qt.UserRole)
+        if hasattr(self, 'image_files') and img_file in self.image_files:
+            self.current_image_index = self.image_files.index(img_file)
+            self.load_image(self.current_image_index)
+
     def update_compression_label(self, value):
         self.compression_value_label.setText(str(value))  # 압축 수준 슬라이더의 값을 레이블에 표시합니다.
 
+    def schedule_estimate(self, *args):
+        self.estimate_timer.start()  # 타이머를 다시 시작하므로 연속으로 바꾸는 동안에는 예측하지 않습니다.
+
+    def start_estimate(self):
+        if not self.manifest or not hasattr(self, 'crop_rect') or self.crop_rect.isNull():
+            return
+        if self.manifest_refreshing(notify=False):
+            return  # 갱신이 끝나면 on_manifest_refreshed에서 다시 예측합니다.
+        if self.estimate_thread and self.estimate_thread.isRunning():
+            self.estimate_pending = True  # 지금 예측이 끝나면 바뀐 설정으로 다시 예측합니다.
+            return
+        self.estimate_pending = False
+
+        excluded_images = self.get_excluded_images()
+        images = [(name, sha1) for name, width, height, mode, image_format, size, sha1 in self.manifest.pages()
+                  if name not in excluded_images]
+        if not images:
+            self.estimate_label.setText("")
+            return
+
+        self.estimate_label.setText("예상: 계산 중...")
+        self.estimate_thread = EstimateThread(parent=self, image_folder=self.image_folder, images=images,
+                                              **self.pdf_build_settings())
+        self.estimate_thread.estimate_signal.connect(self.estimate_label.setText)
+        self.estimate_thread.finished.connect(self.on_estimate_finished)
+        self.estimate_thread.start()
+
+    def on_estimate_finished(self):
+        if self.estimate_pending:
+            self.start_estimate()
+
+    # PDF 생성과 용량 예측에 함께 쓰는 설정값을 모읍니다.
+    def pdf_build_settings(self):
+        # 방향 설정
+        orientation = self.orientation_group.checkedButton().text()
+        if orientation == "가로":
+            pagesize = landscape(A4)
+        else:
+            pagesize = A4
+
+        return dict(
+            crop_box=(self.crop_rect.left(), self.crop_rect.top(),
+                      self.crop_rect.right(), self.crop_rect.bottom()),
+            compression_level=self.compression_slider.value(),
+            pagesize=pagesize,
+            workers=self.workers_spin.value(),
+            jpegtran_path=self.jpegtran_path if self.lossless_jpeg_checkbox.isChecked() else None,
+            target_dpi=self.target_dpi_spin.value(),
+            bilevel_text=self.bilevel_text_checkbox.isChecked(),
+            grayscale_detect=self.grayscale_checkbox.isChecked(),
+            auto_encoder=self.auto_encoder_checkbox.isChecked(),
+            min_psnr=self.min_psnr_spin.value(),
+            min_ssim=self.min_ssim_spin.value() if self.ssim_target_checkbox.isChecked() else 0,
+            target_size_mb=self.target_size_spin.value(),
+            adaptive_crop=self.adaptive_crop_checkbox.isChecked(),
+            split_spreads=self.split_spreads_checkbox.isChecked(),
+            deskew=self.deskew_checkbox.isChecked(),
+            flatten_background=self.flatten_background_checkbox.isChecked(),
+            mrc=self.mrc_checkbox.isChecked(),
+            jpx_rate=self.jpx_rate_spin.value() if self.jpx_checkbox.isChecked() else 0,
+            jpeg_qtables=self.selected_jpeg_qtables(),
+            jpeg_subsampling=self.subsampling_combo.currentData()
+        )
+
+    # JPEG 2000은 품질 대신 압축률로 크기를 정하므로, JPEG 품질을 정하는 목표 화질/목표 용량 설정은 쓸 수 없습니다.
+    def on_jpx_toggled(self, checked):
+        for widget in [self.ssim_target_checkbox, self.min_ssim_spin, self.target_size_spin]:
+            widget.setEnabled(not checked)
+
+    # 고른 양자화 테이블 (품질 50 기준). 조정값 파일이 없거나 읽을 수 없으면 libjpeg 기본 테이블을 씁니다.
+    def selected_jpeg_qtables(self):
+        preset = self.qtable_combo.currentData()
+        if preset != 'tuned':
+            return JPEG_QTABLE_PRESETS[preset]
+        try:
+            with open(os.path.join(self.cropper_folder, "jpeg_qtables.json"), 'r', encoding='utf-8') as f:
+                tuned = json.load(f)
+            return {'luma': tuned['luma'], 'chroma': tuned['chroma']}
+        except (OSError, ValueError, KeyError) as e:
+            logging.warning(f"조정한 양자화 테이블을 읽을 수 없어 기본 테이블을 씁니다: {str(e)}")
+            return None
+
+    def start_qtable_tuning(self):
+        if self.qtable_thread and self.qtable_thread.isRunning():
+            return
+        if not self.manifest:
+            QMessageBox.warning(self, "경고", "먼저 폴더를 선택해주세요.")
+            return
+        if self.manifest_refreshing():
+            return
+        if not hasattr(self, 'crop_rect') or self.crop_rect.isNull():
+            QMessageBox.warning(self, "경고", "크롭 영역을 선택해주세요.")
+            return
+        images = self.manifest.names()
+        if not images:
+            QMessageBox.warning(self, "경고", "선택한 폴더에 이미지 파일이 없습니다.")
+            return
+
+        self.qtable_thread = QTableTuneThread(
+            parent=self,
+            image_folder=self.image_folder,
+            images=images,
+            crop_box=(self.crop_rect.left(), self.crop_rect.top(), self.crop_rect.right(), self.crop_rect.bottom()),
+            quality=self.compression_slider.value(),
+            subsampling=self.subsampling_combo.currentData(),
+            output_path=os.path.join(self.cropper_folder, "jpeg_qtables.json")
+        )
+        self.qtable_thread.message_signal.connect(lambda title, msg: QMessageBox.information(self, title, msg))
+        self.qtable_thread.progress_label_signal.connect(self.progress_label.setText)
+        self.qtable_thread.result_signal.connect(self.on_qtables_tuned)
+
+        self.tune_qtable_button.setEnabled(False)
+        self.progress_label.setVisible(True)
+        self.qtable_thread.start()
+
+    def on_qtables_tuned(self, output_path):
+        self.tune_qtable_button.setEnabled(True)
+        self.progress_label.setVisible(False)
+        if output_path:
+            self.qtable_combo.setCurrentIndex(self.qtable_combo.findData('tuned'))  # 조정한 테이블을 바로 씁니다.
+            self.schedule_estimate()
+
     def on_tab_changed(self, index):
         if self.tab_widget.tabText(index) == "PDF 생성":  # 현재 선택된 탭이 "PDF 생성" 탭인 경우
             if not self.is_pdf_tab_initialized:  # PDF 탭이 초기화되지 않았다면
@@ -843,6 +3238,10 @@ class IntegratedEBookApp(QMainWindow):
 
     def create_pdf(self):
         try:
+            if self.pdf_thread and self.pdf_thread.isRunning():
+                QMessageBox.warning(self, "경고", "이미 PDF를 생성하고 있습니다.")
+                return
+
             if not hasattr(self, 'crop_rect') or self.crop_rect.isNull():
                 QMessageBox.warning(self, "경고", "크롭 영역을 선택해주세요.")
                 return
@@ -855,83 +3254,57 @@ class IntegratedEBookApp(QMainWindow):
             pdf_name = f"cropped_ebook_{current_time}.pdf"
             pdf_path = os.path.join(self.cropper_folder, pdf_name)
         
-            images = [f for f in os.listdir(self.image_folder) if f.lower().endswith(('.png', '.jpg', '.jpeg', '.gif', '.bmp'))]
-            if not images:
+            if self.manifest_refreshing():
+                return
+            self.manifest.refresh(self.workers_spin.value())  # 바뀐 파일만 다시 읽습니다.
+            if not self.manifest.pages():
                 QMessageBox.warning(self, "경고", "선택한 폴더에 이미지 파일이 없습니다.")
                 return
 
-            total_steps = len(images)
-        
-            # 방향 설정
-            orientation = self.orientation_group.checkedButton().text()
-            if orientation == "가로":
-                pagesize = landscape(A4)
-            else:
-                pagesize = A4
+            # 중복 페이지 목록에서 체크된 페이지는 제외합니다.
+            excluded_images = self.get_excluded_images()
+            images = [(name, sha1) for name, width, height, mode, image_format, size, sha1 in self.manifest.pages()
+                      if name not in excluded_images]
+            if not images:
+                QMessageBox.warning(self, "경고", "모든 페이지가 제외되어 PDF를 만들 수 없습니다. 중복 페이지 목록에서 체크를 풀어주세요.")
+                return
 
-            c = canvas.Canvas(pdf_path, pagesize=pagesize)
-            page_width, page_height = pagesize
+            total_steps = len(images)
 
+            # PDF 생성 스레드 인스턴스 생성 시 값 전달
+            self.pdf_thread = PdfBuildThread(
+                parent=self,
+                pdf_path=pdf_path,
+                image_folder=self.image_folder,
+                images=images,
+                save_dir=os.path.join(self.cropper_folder, "cropped_images") if self.save_cropped_checkbox.isChecked() else None,
+                memory_limit_mb=self.memory_limit_spin.value(),
+                cache_dir=os.path.join(self.cropper_folder, "page_cache"),
+                cache_size_mb=self.cache_size_spin.value(),
+                **self.pdf_build_settings()
+            )
+
+            # 프로그레스 바 초기화
             self.progress_bar.setRange(0, total_steps)
             self.progress_bar.setValue(0)
             self.progress_bar.setVisible(True)
+            self.progress_label.setText(f"처리 중: 0/{total_steps}")
             self.progress_label.setVisible(True)
+            self.error_list.clear()
+            self.error_list.setVisible(False)
 
-            batch_size = 10
-        
-            with tempfile.TemporaryDirectory() as temp_dir:
-                for i, img_file in enumerate(images):
-                    try:
-                        img_path = os.path.join(self.image_folder, img_file)
-                        img = Image.open(img_path)
-                        cropped_img = img.crop((self.crop_rect.left(), self.crop_rect.top(),
-                                                self.crop_rect.right(), self.crop_rect.bottom()))
-
-                        # 저장할 디렉토리 생성
-                        save_dir = os.path.join(self.cropper_folder, "cropped_images")
-                        os.makedirs(save_dir, exist_ok=True)
-                        
-                        # 크롭된 이미지 저장
-                        cropped_img_path = os.path.join(save_dir, f"cropped_image_{i+1}.png")
-                        cropped_img.save(cropped_img_path)
-                        
-                        temp_img_path = os.path.join(temp_dir, f"temp_{img_file}")
-                        compression_level = self.compression_slider.value()
-                        cropped_img.save(temp_img_path, format='JPEG', quality=compression_level, optimize=True)
-                        
-                        img_reader = ImageReader(temp_img_path)
-                        img_width, img_height = cropped_img.size
-                        width_ratio = page_width / img_width
-                        height_ratio = page_height / img_height
-                        scale_factor = min(width_ratio, height_ratio)
-                    
-                        new_width = img_width * scale_factor
-                        new_height = img_height * scale_factor
-                    
-                        x_centered = (page_width - new_width) / 2
-                        y_centered = (page_height - new_height) / 2
-                    
-                        c.drawImage(img_reader, x_centered, y_centered, width=new_width, height=new_height)
-                        c.showPage()
-                    
-                        self.progress_bar.setValue(i + 1)
-                        self.progress_label.setText(f"처리 중: {i + 1}/{total_steps}\n{img_file}")
-                        QApplication.processEvents()
-
-                    except Exception as e:
-                        logging.error(f"이미지 처리 중 오류 발생 {img_file}: {str(e)}")
-                        QMessageBox.warning(self, "경고", f"이미지 처리 중 오류 발생: {img_file}\n{str(e)}")
-
-                c.save()
-            
-            compressed_pdf_path = self.compress_pdf(pdf_path)
+            # 시그널 연결
+            self.pdf_thread.message_signal.connect(lambda title, msg: QMessageBox.information(self, title, msg))
+            self.pdf_thread.progress_signal.connect(self.progress_bar.setValue)
+            self.pdf_thread.progress_label_signal.connect(self.progress_label.setText)
+            self.pdf_thread.page_error_signal.connect(self.on_pdf_page_errors)
+            self.pdf_thread.build_finished_signal.connect(self.on_pdf_finished)
 
-            self.progress_bar.setVisible(False)
-            self.progress_label.setVisible(False)
-            QMessageBox.information(self, "완료", f"PDF 생성 및 압축이 완료되었습니다.\n저장 위치: {compressed_pdf_path}")
+            self.create_pdf_button.setEnabled(False)  # 생성 중에는 PDF 생성 버튼을 비활성화합니다.
+            self.stop_pdf_button.setEnabled(True)  # PDF 생성 중지 버튼을 활성화합니다.
 
-            if self.auto_open_checkbox.isChecked():
-                self.open_pdf(compressed_pdf_path)
+            # PDF 생성 스레드 시작
+            self.pdf_thread.start()
             
         except Exception as e:
             error_msg = f"PDF 생성 중 오류가 발생했습니다: {str(e)}\n\n"
@@ -943,21 +3316,39 @@ class IntegratedEBookApp(QMainWindow):
             QMessageBox.critical(self, "오류", error_msg)
             logging.error(error_msg)
 
-    def compress_pdf(self, input_path, output_path=None):
-        if output_path is None:
-            output_path = input_path  # 출력 경로가 지정되지 않은 경우 입력 경로를 사용합니다.
-        
-        reader = PdfReader(input_path)  # PDF 파일을 읽습니다.
-        writer = PdfWriter()  # 새로운 PDF 작성자를 생성합니다.
-
-        for page in reader.pages:
-            page.compress_content_streams()  # 각 페이지의 내용을 압축합니다. (CPU 집약적인 작업입니다)
-            writer.add_page(page)  # 압축된 페이지를 새 PDF에 추가합니다.
+    def stop_pdf(self):
+        if self.pdf_thread and self.pdf_thread.isRunning():
+            self.pdf_thread.stop()  # PDF 생성 스레드 중지 요청 (현재 페이지까지 처리 후 멈춥니다.)
+            self.stop_pdf_button.setEnabled(False)
+            self.progress_label.setText("중지하는 중...")
+
+    def on_pdf_page_errors(self, errors):
+        # 오류가 난 페이지를 메시지 박스 대신 목록에 모아서 보여줍니다.
+        for img_file, error in errors:
+            self.error_list.addItem(f"{img_file}: {error}")
+        self.error_list.setVisible(True)
+
+    def on_pdf_finished(self, pdf_path, error_count, cancelled, report):
+        self.progress_bar.setVisible(False)
+        self.progress_label.setVisible(False)
+        self.create_pdf_button.setEnabled(True)
+        self.stop_pdf_button.setEnabled(False)
+
+        if cancelled:
+            QMessageBox.information(self, "PDF 생성 중지", "PDF 생성이 중지되었습니다.")
+            return
+        if not pdf_path:
+            return  # 오류 메시지는 스레드에서 이미 전달되었습니다.
 
-        with open(output_path, "wb") as f:
-            writer.write(f)  # 압축된 PDF를 파일로 저장합니다.
+        message = f"PDF 생성 및 압축이 완료되었습니다.\n저장 위치: {pdf_path}"
+        if report:
+            message += f"\n\n{report}"
+        if error_count:
+            message += f"\n\n오류가 발생한 {error_count}개 페이지는 제외되었습니다. (진행 상황의 오류 목록 참고)"
+        QMessageBox.information(self, "완료", message)
 
-        return output_path  # 압축된 PDF의 경로를 반환합니다.
+        if self.auto_open_checkbox.isChecked():
+            self.open_pdf(pdf_path)
 
     def open_pdf(self, pdf_path):
         try:
@@ -972,8 +3363,10 @@ class IntegratedEBookApp(QMainWindow):
 
     def initialize_pdf_tab(self):
         self.initialize_folders()  # 폴더를 초기화합니다.
+        self.open_manifest()  # 선택한 폴더의 이미지 목록(매니페스트)을 엽니다.
         self.move_files_to_image_folder()  # 이미지 파일을 이동합니다.
         self.load_first_image()  # 첫 번째 이미지를 로드합니다.
+        self.schedule_estimate()  # 새 폴더의 예상 용량과 생성 시간을 계산합니다.
         self.is_pdf_tab_initialized = True  # PDF 탭 초기화 완료 플래그를 설정합니다.
 
     def initialize_folders(self):
@@ -989,38 +3382,77 @@ class IntegratedEBookApp(QMainWindow):
             QMessageBox.critical(self, "오류", error_msg)  # 오류 메시지를 표시합니다.
             logging.error(error_msg)  # 오류를 로그에 기록합니다.
 
+    def open_manifest(self):
+        try:
+            if self.manifest:
+                self.manifest.close()  # 이전 폴더의 매니페스트를 닫습니다.
+            self.manifest = PageManifest(self.image_folder)
+        except Exception as e:
+            self.manifest = None
+            error_msg = f"이미지 목록을 여는 중 오류가 발생했습니다: {str(e)}\n\n"  # 오류 메시지를 생성합니다.
+            error_msg += traceback.format_exc()  # 상세한 오류 정보를 추가합니다.
+            QMessageBox.critical(self, "오류", error_msg)  # 오류 메시지를 표시합니다.
+            logging.error(error_msg)  # 오류를 로그에 기록합니다.
+
     def move_files_to_image_folder(self):
-        image_extensions = ('.png', '.jpg', '.jpeg', '.gif', '.bmp')  # 이미지 파일 확장자 목록입니다.
         moved_files = 0  # 이동된 파일 수를 추적합니다.
-        for filename in os.listdir(self.base_folder):  # 기본 폴더의 모든 파일에 대해
-            if filename.lower().endswith(image_extensions):  # 이미지 파일인 경우
-                src_path = os.path.join(self.base_folder, filename)  # 원본 파일 경로
-                dst_path = os.path.join(self.image_folder, filename)  # 대상 파일 경로
-                try:
-                    shutil.move(src_path, dst_path)  # 파일을 이동합니다.
-                    moved_files += 1  # 이동된 파일 수를 증가시킵니다.
-                    logging.info(f"Moved file: {filename}")  # 로그에 기록합니다.
-                except Exception as e:
-                    logging.error(f"Error moving file {filename}: {str(e)}")  # 오류를 로그에 기록합니다.
+        for filename in scan_image_files(self.base_folder):  # 기본 폴더의 모든 이미지 파일에 대해
+            src_path = os.path.join(self.base_folder, filename)  # 원본 파일 경로
+            dst_path = os.path.join(self.image_folder, filename)  # 대상 파일 경로
+            try:
+                shutil.move(src_path, dst_path)  # 파일을 이동합니다.
+                moved_files += 1  # 이동된 파일 수를 증가시킵니다.
+                logging.info(f"Moved file: {filename}")  # 로그에 기록합니다.
+            except Exception as e:
+                logging.error(f"Error moving file {filename}: {str(e)}")  # 오류를 로그에 기록합니다.
         
         if moved_files > 0:
             logging.info(f"{moved_files}개의 이미지 파일이 Image 폴더로 이동되었습니다.")  # 이동된 파일 수를 로그에 기록합니다.
 
     def load_first_image(self):
         try:
-            self.image_files = [f for f in os.listdir(self.image_folder) if f.lower().endswith(('.png', '.jpg', '.jpeg', '.gif', '.bmp'))]  # 이미지 파일 목록을 가져옵니다.
+            if not self.manifest:
+                return  # 매니페스트를 열지 못한 경우 (오류는 이미 표시되었습니다.)
+            # 파일 목록은 바로 읽어 첫 이미지를 보여 주고, 매니페스트 갱신(해시 계산)은 스레드에서 합니다.
+            self.image_files = list(scan_image_files(self.image_folder))  # 이미지 파일 목록을 페이지(이름) 순서대로 가져옵니다.
             if not self.image_files:  # 이미지 파일이 없는 경우
                 QMessageBox.warning(self, "경고", "선택한 폴더에 이미지 파일이 없습니다.")  # 경고 메시지를 표시합니다.
                 return
 
             self.current_image_index = 0  # 현재 이미지 인덱스를 0으로 설정합니다.
             self.load_image(self.current_image_index)  # 첫 번째 이미지를 로드합니다.
+            self.start_manifest_refresh()  # 새로 생기거나 바뀐 파일만 매니페스트에 반영합니다.
         except Exception as e:
             error_msg = f"이미지 로드 중 오류가 발생했습니다: {str(e)}\n\n"  # 오류 메시지를 생성합니다.
             error_msg += traceback.format_exc()  # 상세한 오류 정보를 추가합니다.
             QMessageBox.critical(self, "오류", error_msg)  # 오류 메시지를 표시합니다.
             logging.error(error_msg)  # 오류를 로그에 기록합니다.
 
+    def start_manifest_refresh(self):
+        # 다른 폴더의 갱신이 아직 끝나지 않았어도 스레드는 부모(self)가 가지고 있으므로 그대로 두고, 결과만 무시합니다.
+        self.manifest_thread = ManifestRefreshThread(parent=self, image_folder=self.image_folder,
+                                                     workers=self.workers_spin.value())
+        self.manifest_thread.message_signal.connect(lambda title, msg: QMessageBox.information(self, title, msg))
+        self.manifest_thread.progress_label_signal.connect(self.progress_label.setText)
+        self.manifest_thread.result_signal.connect(self.on_manifest_refreshed)
+        self.progress_label.setVisible(True)
+        self.manifest_thread.start()
+
+    def on_manifest_refreshed(self, image_folder):
+        if image_folder and image_folder != self.image_folder:
+            return  # 이전 폴더의 결과입니다.
+        self.progress_label.setVisible(False)
+        if image_folder:
+            self.schedule_estimate()  # 목록이 준비되었으므로 예상 용량과 생성 시간을 계산합니다.
+
+    # 이미지 목록을 갱신하는 중인지 확인합니다. (갱신이 끝나기 전에는 목록을 쓰는 작업을 시작하지 않습니다.)
+    def manifest_refreshing(self, notify=True):
+        if self.manifest_thread and self.manifest_thread.isRunning():
+            if notify:
+                QMessageBox.information(self, "알림", "이미지 목록을 읽는 중입니다. 잠시 후 다시 시도해주세요.")
+            return True
+        return False
+
     def load_image(self, index):
         if 0 <= index < len(self.image_files):  # 유효한 인덱스인지 확인합니다.
             try:
@@ -1064,6 +3496,7 @@ class IntegratedEBookApp(QMainWindow):
             self.folder_label.setText(f"선택된 폴더: {self.base_folder}")  # 폴더 레이블을 업데이트합니다.
             self.image_folder = os.path.join(self.base_folder, "Image")  # 이미지 폴더 경로를 업데이트합니다.
             self.cropper_folder = os.path.join(self.base_folder, "Cropper")  # 크로퍼 폴더 경로를 업데이트합니다.
+            self.duplicate_list.clear()  # 다른 폴더의 중복 페이지 목록은 지웁니다.
             self.initialize_pdf_tab()  # PDF 탭을 초기화합니다.
 
     def change_default_path(self):
@@ -1076,13 +3509,28 @@ class IntegratedEBookApp(QMainWindow):
     def show_message(self, title, message):
         QMessageBox.information(None, title, message)
 
+    # 창을 닫을 때 실행 중인 스레드를 멈추고 끝날 때까지 기다립니다.
+    # (실행 중인 QThread가 지워지면 프로그램이 비정상 종료되고, 작업 프로세스와 만들다 만 PDF가 남습니다.)
+    def closeEvent(self, event):
+        if hasattr(self, 'estimate_timer'):
+            self.estimate_timer.stop()
+        for thread in [self.macro_thread, self.pdf_thread, self.estimate_thread, self.manifest_thread,
+                       self.duplicate_thread, self.auto_crop_thread, self.qtable_thread]:
+            if thread and thread.isRunning():
+                if hasattr(thread, 'stop'):
+                    thread.stop()
+                thread.wait()
+        if self.manifest:
+            self.manifest.close()
+        super().closeEvent(event)
+
     def on_tab_changed(self, index):
-        if index == 1 and not hasattr(self, 'is_pdf_tab_initalized'):
+        if index == 1 and not self.is_pdf_tab_initialized:  # 탭을 옮길 때마다 다시 초기화하지 않습니다.
             self.initialize_pdf_tab()
-            self.if_pdf_tab_initialized = True
 
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()  # EXE(pyinstaller)로 실행할 때 작업 프로세스가 창을 다시 띄우지 않도록 합니다.
     app = QApplication(sys.argv)  # QApplication 인스턴스를 생성합니다.
     window = IntegratedEBookApp()  # IntegratedEBookApp 인스턴스를 생성합니다.
     window.show()  # 윈도우를 표시합니다.